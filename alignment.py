@@ -0,0 +1,115 @@
+# alignment.py
+#
+# Monotonic alignment engine for merge_subtitles(): a banded dynamic-programming
+# alternative to the greedy best-chunk search in matching.py.
+
+from bisect import bisect_left, bisect_right
+
+from matching import clean_token, token_set
+
+
+def asr_word_sequence(asr_track):
+    """
+    Flatten an ASR SubtitleTrack into (token, start_ms, end_ms) per word.
+    Segment-level cues spread their duration evenly over their words;
+    word-level cues (one word each) keep their exact timing.
+    """
+    words = []
+    for start, end, text in zip(asr_track.starts.tolist(), asr_track.ends.tolist(), asr_track.texts):
+        parts = text.split()
+        if not parts:
+            continue
+        step = (end - start) / len(parts)
+        for n, part in enumerate(parts):
+            words.append((
+                clean_token(part),
+                int(start + step * n),
+                int(start + step * (n + 1))
+            ))
+    return words
+
+
+def align_monotonic(cues, words, tolerance_ms, min_score=0.5, slack=2):
+    """
+    Align cues to the ASR word sequence, keeping matches in time order.
+
+    cues:  list of (text, start_ms, end_ms) in subtitle order.
+    words: output of asr_word_sequence().
+
+    Each cue may start a match at any word inside its band (cue ± tolerance)
+    and covers up to len(cue) + slack words; cues and words may be skipped.
+    The DP maximises the summed token_match_score of matched cues, and no two
+    matches may overlap or cross. Returns {cue_pos: (start_ms, end_ms, score)}.
+
+    State is a Pareto front of (word frontier, best total) points. Points that
+    no remaining band can reach are collapsed as the bands move forward, so
+    memory follows the band width rather than cues × words.
+    """
+    if not cues or not words:
+        return {}
+
+    tokens = [w[0] for w in words]
+    word_starts = [w[1] for w in words]
+    band_pad = max(tolerance_ms, 1000)
+
+    bands = []
+    for _, start_ms, end_ms in cues:
+        lo = bisect_left(word_starts, start_ms - band_pad)
+        hi = bisect_right(word_starts, end_ms + band_pad)
+        bands.append((lo, hi))
+
+    # Smallest band start among the cues still to come
+    future_lo = [len(words)] * (len(cues) + 1)
+    for pos in range(len(cues) - 1, -1, -1):
+        future_lo[pos] = min(bands[pos][0], future_lo[pos + 1])
+
+    # Pareto front: fronts ascending, vals strictly ascending, nodes for backtracking
+    fronts, vals, nodes = [0], [0.0], [None]
+
+    for pos, (text, _, _) in enumerate(cues):
+        wanted = token_set(text)
+        span = len(text.split()) + slack
+        lo, hi = bands[pos]
+
+        candidates = []
+        for k in range(lo, hi):
+            if tokens[k] not in wanted:
+                continue
+            seen = set()
+            last_hit = k
+            for j in range(k, min(k + span, len(tokens))):
+                if tokens[j] in wanted:
+                    seen.add(tokens[j])
+                    last_hit = j
+            score = len(seen) / max(len(wanted), 1)
+            if score < min_score:
+                continue
+            prev = bisect_right(fronts, k) - 1
+            candidates.append((last_hit + 1, vals[prev] + score, (pos, k, last_hit, score, nodes[prev])))
+
+        for front, val, node in candidates:
+            at = bisect_right(fronts, front)
+            if vals[at - 1] >= val:
+                continue  # dominated by an existing point
+            if fronts[at - 1] == front:
+                at -= 1
+            # Drop later points this one dominates
+            end = at
+            while end < len(fronts) and vals[end] <= val:
+                end += 1
+            del fronts[at:end], vals[at:end], nodes[at:end]
+            fronts.insert(at, front)
+            vals.insert(at, val)
+            nodes.insert(at, node)
+
+        # Collapse points no later band can tell apart
+        keep = bisect_right(fronts, future_lo[pos + 1]) - 1
+        if keep > 0:
+            del fronts[:keep], vals[:keep], nodes[:keep]
+
+    aligned = {}
+    node = nodes[-1]
+    while node is not None:
+        pos, first, last, score, node = node
+        aligned[pos] = (words[first][1], words[last][2], score)
+    return aligned
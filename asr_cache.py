@@ -0,0 +1,124 @@
+# asr_cache.py
+#
+# On-disk cache of Whisper transcriptions (segments + word timestamps), keyed by
+# a content fingerprint of the media file and the decode settings, so re-running
+# a sync with different merge settings skips ASR entirely.
+
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+CACHE_DIR = os.path.expanduser("~/.subtitle_sync_cache/asr")
+
+# Same attribute names as faster-whisper's Segment / Word, so cached results go
+# wherever live ones do (SubtitleTrack.from_segments, the preview, the merge)
+CachedSegment = namedtuple("CachedSegment", "start end text words avg_logprob", defaults=(None,))
+CachedWord = namedtuple("CachedWord", "start end word probability")
+
+
+def media_fingerprint(path, samples=16, block_size=1 << 16):
+    """
+    Fast content hash of a media file: its size plus `samples` evenly spaced
+    blocks. Reads about 1 MB however big the file is, and survives renames.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        if size <= samples * block_size:
+            digest.update(f.read())
+        else:
+            step = (size - block_size) // (samples - 1)
+            for n in range(samples):
+                f.seek(n * step)
+                digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
+def evict_lru(root, max_mb, suffix):
+    """
+    Delete the least recently used (oldest mtime) files ending in suffix
+    under root until they total at most max_mb.
+    """
+    try:
+        names = [n for n in os.listdir(root) if n.endswith(suffix)]
+    except OSError:
+        return
+    entries = []
+    for name in names:
+        try:
+            st = os.stat(os.path.join(root, name))
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    limit = max_mb * 1024 * 1024
+    for _, size, name in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(os.path.join(root, name))
+            total -= size
+        except OSError:
+            pass
+
+
+class AsrCache:
+    """
+    One JSON file per transcription under root. A file's mtime is its last
+    use; when the total passes max_mb the least recently used are deleted.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_mb=500):
+        self.root = root
+        self.max_mb = max_mb
+
+    @staticmethod
+    def key(fingerprint, model_id, beam_size, word_timestamps, language=None, clips=None):
+        """clips: the (start_ms, end_ms) windows of a targeted run; None for the whole file."""
+        parts = [fingerprint, model_id, f"beam{beam_size}", "words" if word_timestamps else "segments", language or "auto"]
+        if clips is not None:
+            parts.append(",".join(f"{start}-{end}" for start, end in clips))
+        return hashlib.blake2b("|".join(parts).encode(), digest_size=16).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key + ".json")
+
+    def get(self, key):
+        """Cached segments for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # mark as recently used
+        return [
+            CachedSegment(s, e, text, [CachedWord(*w) for w in words] if words is not None else None, *rest)
+            for s, e, text, words, *rest in data["segments"]  # entries before avg_logprob have four fields
+        ]
+
+    def put(self, key, segments, **meta):
+        os.makedirs(self.root, exist_ok=True)
+        data = {
+            "meta": meta,
+            "segments": [
+                [
+                    seg.start, seg.end, seg.text,
+                    [[w.start, w.end, w.word, w.probability] for w in seg.words] if seg.words is not None else None,
+                    getattr(seg, "avg_logprob", None)
+                ]
+                for seg in segments
+            ]
+        }
+        tmp = self._path(key) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def evict(self):
+        evict_lru(self.root, self.max_mb, ".json")
+
+    def clear(self):
+        evict_lru(self.root, 0, ".json")
@@ -0,0 +1,69 @@
+# asr_windows.py
+#
+# Targeted ASR: when the original subtitles are already known, only the audio
+# around their cues needs transcribing. Credits, music and long silences are
+# skipped entirely.
+
+from audio_stream import shift_segment
+
+
+def is_comment(text):
+    return text.startswith("[") and text.endswith("]")
+
+
+def cue_windows(track, pad_ms, duration_ms=None, skip_comments=True):
+    """
+    Merged (start_ms, end_ms) spans covering every cue ± pad_ms, in time order.
+    Overlapping or touching spans are joined; [comment] cues add nothing.
+    """
+    spans = sorted(
+        (max(0, start - pad_ms), end + pad_ms)
+        for start, end, text in zip(track.starts.tolist(), track.ends.tolist(), track.texts)
+        if not (skip_comments and is_comment(text))
+    )
+    merged = []
+    for start, end in spans:
+        if duration_ms is not None:
+            end = min(end, duration_ms)
+            if start >= end:
+                continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(span) for span in merged]
+
+
+def windows_seconds(windows):
+    return sum(end - start for start, end in windows) / 1000
+
+
+def transcribe_windows(model, audio, windows, **transcribe_kwargs):
+    """
+    Transcribe only `windows` of a PcmFile, yielding segments in absolute time.
+
+    Uses faster-whisper's clip_timestamps, so the whole job is one transcribe()
+    call with a single language detection. On versions without clip_timestamps
+    each window is sliced out of the buffer and transcribed on its own; the
+    language detected on the first window is reused for the rest.
+    """
+    if not windows:
+        return
+    clips = [t / 1000 for span in windows for t in span]
+    samples = audio.float32()
+    try:
+        segments, _ = model.transcribe(samples, clip_timestamps=clips, **transcribe_kwargs)
+    except TypeError:
+        segments = None
+
+    if segments is not None:
+        yield from segments
+        return
+
+    options = dict(transcribe_kwargs)
+    for start_ms, end_ms in windows:
+        segments, info = model.transcribe(audio.float32(start_ms / 1000, end_ms / 1000), **options)
+        if options.get("language") is None and getattr(info, "language", None):
+            options["language"] = info.language
+        for segment in segments:
+            yield shift_segment(segment, start_ms / 1000)
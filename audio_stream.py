@@ -0,0 +1,197 @@
+# audio_stream.py
+#
+# Decode a video's audio track through an ffmpeg pipe and transcribe it while
+# it is still being decoded: no temp WAV, and Whisper starts on the first
+# window instead of waiting for the whole extraction.
+
+import os
+import queue
+import re
+import subprocess
+import threading
+from dataclasses import is_dataclass, replace
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+DURATION_LINE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def probe_duration(path, ffmpeg_path="ffmpeg"):
+    """
+    Container duration in seconds via ffprobe (next to ffmpeg), or 0.0 if unknown.
+    Builds that ship only ffmpeg (the frozen GUI) read the "Duration:" line
+    ffmpeg prints for its input instead.
+    """
+    folder, name = os.path.split(ffmpeg_path)
+    ffprobe = os.path.join(folder, name.replace("ffmpeg", "ffprobe")) if folder else "ffprobe"
+    try:
+        import ffmpeg  # type: ignore
+        return float(ffmpeg.probe(path, cmd=ffprobe)["format"]["duration"])
+    except Exception:
+        pass
+    try:
+        # No output file given, so ffmpeg exits with an error after describing the input
+        stderr = subprocess.run([ffmpeg_path, "-hide_banner", "-nostdin", "-i", path],
+                                capture_output=True, timeout=60).stderr.decode("utf-8", "replace")
+    except (OSError, subprocess.SubprocessError):
+        return 0.0
+    match = DURATION_LINE.search(stderr)
+    if not match:
+        return 0.0
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+class PcmStream:
+    """
+    16 kHz mono pcm_s16le from ffmpeg's stdout, as int16 NumPy blocks.
+
+    A reader thread drains the pipe into a queue, so decoding keeps going
+    while the consumer is busy transcribing. The queue holds at most
+    buffer_seconds of audio; past that ffmpeg waits for the consumer instead
+    of decoding the whole file into memory.
+    Iterate for blocks; close() stops ffmpeg early (e.g. on Stop).
+
+    tee (e.g. PcmCache.writer()) receives every raw block via write(), then
+    commit() if ffmpeg decoded the whole file or abort() otherwise.
+    """
+
+    def __init__(self, path, ffmpeg_path="ffmpeg", block_seconds=1.0, tee=None, buffer_seconds=300.0):
+        self.path = path
+        self.tee = tee
+        self.duration = probe_duration(path, ffmpeg_path)
+        self.samples_read = 0
+        self._block_bytes = int(SAMPLE_RATE * block_seconds) * 2
+        self._blocks = queue.Queue(maxsize=max(1, int(buffer_seconds / block_seconds)))
+        self._closed = False
+        import ffmpeg  # type: ignore  # imported here so the module loads (e.g. in tests) without it
+        self._process = (
+            ffmpeg.input(path)
+            .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=str(SAMPLE_RATE))
+            .global_args("-loglevel", "error", "-nostdin")
+            .run_async(cmd=ffmpeg_path, pipe_stdout=True)
+        )
+        self._reader = threading.Thread(target=self._read, name="ffmpeg-pcm", daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        stdout = self._process.stdout
+        complete = False
+        try:
+            while True:
+                raw = stdout.read(self._block_bytes)
+                if not raw:
+                    break
+                if len(raw) % 2:
+                    raw = raw[:-1]
+                if self.tee:
+                    try:
+                        self.tee.write(raw)
+                    except OSError:  # e.g. cache disk full: keep streaming, skip caching
+                        self.tee.abort()
+                        self.tee = None
+                self._put(np.frombuffer(raw, dtype=np.int16))
+            complete = self._process.wait() == 0
+        finally:
+            if self.tee:
+                self.tee.commit() if complete else self.tee.abort()
+            self._put(None)
+
+    def _put(self, item):
+        # Blocks while the queue is full; gives up once nobody will read it again
+        while not self._closed:
+            try:
+                self._blocks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def __iter__(self):
+        while True:
+            block = self._blocks.get()
+            if block is None:
+                code = self._process.wait()
+                if code not in (0, None) and not self.samples_read:
+                    raise RuntimeError(f"ffmpeg could not decode audio from {self.path} (exit code {code})")
+                return
+            self.samples_read += len(block)
+            yield block
+
+    def close(self):
+        self._closed = True
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def shift_segment(segment, offset):
+    """Copy of a faster-whisper Segment (and its words) moved by offset seconds."""
+    if not offset:
+        return segment
+    clone = replace if is_dataclass(segment) else (lambda obj, **kw: obj._replace(**kw))
+    words = segment.words
+    if words:
+        words = [clone(w, start=w.start + offset, end=w.end + offset) for w in words]
+    return clone(segment, start=segment.start + offset, end=segment.end + offset, words=words)
+
+
+def stream_transcribe(model, blocks, window_seconds=120.0, margin_seconds=10.0, **transcribe_kwargs):
+    """
+    Transcribe int16 PCM blocks as they arrive, one window at a time.
+
+    Each window is passed to model.transcribe() as float32 audio. Segments that
+    end within margin_seconds of the window's edge may be cut off, so they are
+    dropped and the next window restarts where the first dropped segment
+    starts. Only a segment that starts at the window's start and runs into
+    the margin forces the next window past it.
+    Yields segments with absolute timestamps, in time order.
+    """
+    window = int(window_seconds * SAMPLE_RATE)
+    margin = int(margin_seconds * SAMPLE_RATE)
+    pending = []         # int16 blocks not yet transcribed
+    pending_len = 0
+    origin = 0           # absolute sample index of pending[0][0]
+    blocks = iter(blocks)
+    finished = False
+
+    while not finished or pending_len:
+        while not finished and pending_len < window:
+            block = next(blocks, None)
+            if block is None:
+                finished = True
+            else:
+                pending.append(block)
+                pending_len += len(block)
+        if not pending_len:
+            break
+
+        audio = np.concatenate(pending)
+        offset = origin / SAMPLE_RATE
+        cut = len(audio) if finished else len(audio) - margin
+        resume = cut
+
+        segments, _ = model.transcribe(audio.astype(np.float32) / 32768.0, **transcribe_kwargs)
+        for segment in segments:
+            if not finished and segment.end * SAMPLE_RATE > cut:
+                start = int(segment.start * SAMPLE_RATE)
+                # Speech after leading silence restarts the next window; a segment
+                # filling the window from its start would never advance, so skip on
+                if start > 0:
+                    resume = min(start, cut)
+                break
+            yield shift_segment(segment, offset)
+        if finished:
+            break
+
+        origin += resume
+        pending = [audio[resume:]]
+        pending_len = len(audio) - resume
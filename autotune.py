@@ -0,0 +1,213 @@
+# autotune.py
+#
+# Finds the fastest CPU settings for Whisper on this machine: a fixed 60-second
+# excerpt is transcribed under a grid of compute_type × cpu_threads, each in a
+# fresh process so load time and peak memory are its own. Configs are ranked
+# by single-stream RTF, because a sync transcribes one stream at a time; the
+# winner's compute_type and cpu_threads are stored in the config file and used
+# by every later run. --throughput N also reports the aggregate RTF of N
+# concurrent streams (num_workers=N), for batch or server use; it never
+# affects the ranking or what is stored.
+#
+#   python autotune.py VIDEO [--model models/whisper-large-v3] [--seconds 60] [--throughput 2]
+
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from audio_stream import SAMPLE_RATE
+
+CONFIG_PATH = os.path.expanduser("~/.subtitle_sync_config.json")
+TUNING_KEY = "asr_tuning"
+COMPUTE_TYPES = ("int8", "int8_float32", "float32")
+DEFAULT_RUNTIME = {"compute_type": "int8", "cpu_threads": 0, "num_workers": 1}
+TUNED_KEYS = ("compute_type", "cpu_threads")  # what a tuning record sets; syncs always use one worker
+
+
+def machine_id():
+    # Tuning is only valid on the machine (and core count) it ran on
+    return f"{platform.node()}/{os.cpu_count()}"
+
+
+def thread_options(cores=None):
+    cores = cores or os.cpu_count() or 1
+    return sorted({max(1, cores // 4), max(1, cores // 2), cores})
+
+
+def grid(compute_types=COMPUTE_TYPES, threads=None, cores=None):
+    """(compute_type, cpu_threads) to try."""
+    cores = cores or os.cpu_count() or 1
+    return [
+        (compute_type, cpu_threads)
+        for compute_type in compute_types
+        for cpu_threads in (threads or thread_options(cores))
+        if cpu_threads <= cores
+    ]
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where it can't be read."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil  # type: ignore
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+
+
+def _measure(model_path, compute_type, cpu_threads, audio, beam_size, streams=1):
+    """
+    Runs in a fresh process: load, one transcription of audio on its own,
+    then (streams > 1) `streams` concurrent ones. Returns load, single-stream
+    and concurrent seconds (None without streams) and peak RSS.
+    """
+    from model_pool import _load_whisper
+
+    started = time.perf_counter()
+    model = _load_whisper(model_path, "auto", compute_type, cpu_threads, streams)
+    load_s = time.perf_counter() - started
+
+    errors = []
+
+    def run():
+        try:
+            segments, _ = model.transcribe(audio, beam_size=beam_size)
+            for _ in segments:  # decoding happens as the generator is consumed
+                pass
+        except Exception as e:
+            errors.append(e)
+
+    def timed(count):
+        started = time.perf_counter()
+        threads = [threading.Thread(target=run) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return time.perf_counter() - started
+
+    single_s = timed(1)
+    concurrent_s = timed(streams) if streams > 1 else None
+    return load_s, single_s, concurrent_s, peak_rss_mb()
+
+
+def tune(model_path, audio, beam_size=5, configs=None, on_result=None, stop_flag=None, throughput_streams=1):
+    """
+    Measure each (compute_type, cpu_threads) on a float32 excerpt. Returns
+    result dicts sorted fastest first by rtf: single-stream processing time
+    per second of audio, so lower is better. With throughput_streams > 1,
+    throughput_rtf is the same across that many concurrent streams (report
+    only). Configs the backend rejects (e.g. a compute_type this CPU lacks)
+    carry an error instead.
+    """
+    seconds = len(audio) / SAMPLE_RATE
+    results = []
+    for compute_type, cpu_threads in configs or grid():
+        if stop_flag is not None and stop_flag.is_set():
+            break
+        result = {"compute_type": compute_type, "cpu_threads": cpu_threads}
+        pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            load_s, single_s, concurrent_s, rss = pool.submit(
+                _measure, model_path, compute_type, cpu_threads, audio, beam_size, throughput_streams
+            ).result()
+            result.update(rtf=single_s / seconds, load_s=load_s, peak_rss_mb=rss)
+            if concurrent_s is not None:
+                result.update(throughput_streams=throughput_streams,
+                              throughput_rtf=concurrent_s / (seconds * throughput_streams))
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            pool.shutdown()
+        results.append(result)
+        if on_result:
+            on_result(result)
+    return sorted(results, key=lambda r: r.get("rtf", float("inf")))
+
+
+def best_record(results):
+    """Config entry for the fastest successful result, or None."""
+    ok = [r for r in results if "rtf" in r]
+    if not ok:
+        return None
+    return dict(ok[0], machine=machine_id(), tuned_at=time.strftime("%Y-%m-%d %H:%M"))
+
+
+def tuned_runtime(record):
+    """Runtime with compute_type / cpu_threads from a stored record; defaults if absent or from another machine."""
+    runtime = dict(DEFAULT_RUNTIME)
+    if record and record.get("machine") == machine_id():
+        runtime.update({key: record[key] for key in TUNED_KEYS if key in record})
+    return runtime
+
+
+def format_result(r):
+    if "error" in r:
+        return f"{r['compute_type']:<13} threads={r['cpu_threads']:<3}  failed: {r['error']}"
+    rss = f"{r['peak_rss_mb']:.0f} MB" if r.get("peak_rss_mb") is not None else "n/a"
+    throughput = f"  {r['throughput_streams']}-stream RTF {r['throughput_rtf']:.3f}" if "throughput_rtf" in r else ""
+    return (f"{r['compute_type']:<13} threads={r['cpu_threads']:<3}  "
+            f"RTF {r['rtf']:.3f}{throughput}  load {r['load_s']:.1f}s  peak RSS {rss}")
+
+
+def excerpt(audio, seconds=60.0):
+    """float32 samples of a PcmFile: `seconds` from the middle (dialogue, not intro or credits)."""
+    middle = audio.duration / 2
+    start = max(0.0, middle - seconds / 2)
+    return audio.float32(start, min(audio.duration, start + seconds))
+
+
+def main(argv=None):
+    import argparse
+    from shutil import which
+
+    from pcm_cache import PcmCache
+
+    parser = argparse.ArgumentParser(description="Benchmark Whisper CPU settings and store the fastest.")
+    parser.add_argument("video")
+    parser.add_argument("--model", default="models/whisper-large-v3")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--beam-size", type=int, default=5)
+    parser.add_argument("--config", default=CONFIG_PATH)
+    parser.add_argument("--throughput", type=int, default=1, metavar="N",
+                        help="also report aggregate RTF of N concurrent streams (batch / server use)")
+    parser.add_argument("--dry-run", action="store_true", help="measure only, don't save")
+    args = parser.parse_args(argv)
+
+    with PcmCache().load(args.video, which("ffmpeg") or "ffmpeg") as audio:
+        samples = excerpt(audio, args.seconds)
+    print(f"Tuning on {len(samples) / SAMPLE_RATE:.0f} s of {os.path.basename(args.video)}")
+    results = tune(args.model, samples, args.beam_size, on_result=lambda r: print(format_result(r), flush=True),
+                   throughput_streams=args.throughput)
+    record = best_record(results)
+    if record is None:
+        print("No configuration ran successfully.")
+        return 1
+    print("Fastest:", format_result(record))
+    if not args.dry_run:
+        try:
+            with open(args.config, encoding="utf-8") as f:
+                cfg = json.load(f)
+        except (OSError, ValueError):
+            cfg = {}
+        cfg[TUNING_KEY] = record
+        with open(args.config, "w", encoding="utf-8") as f:
+            json.dump(cfg, f, indent=2)
+        print("Saved to", args.config)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# batch_sync.py
+#
+# Season batch mode: pair every video in a folder with its original .srt,
+# then sync them one after another through one SyncCore, so the model is
+# loaded once (MODEL_POOL) and parallel ASR keeps one worker pool. While
+# episode N is in ASR, ffmpeg is already decoding episode N+1 into the PCM
+# cache. A summary table (wall time, RTF, matched-cue ratio) closes the run.
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_stream import probe_duration
+from model_pool import MODEL_POOL
+from sync_core import output_name
+
+VIDEO_EXTENSIONS = (".mkv", ".mp4", ".m4v", ".avi", ".mov", ".wmv", ".ts", ".webm", ".wav")
+_EPISODE = re.compile(r"s(\d{1,2})\s*e(\d{1,3})", re.IGNORECASE)
+_LANGUAGE = re.compile(r"^[a-z]{2,3}(?:-[a-z]{2})?$", re.IGNORECASE)
+# Suffixes this app writes; such files are outputs, never originals
+_OUTPUT_TAGS = re.compile(r"\.(?:whisper|asr\d*\w*|sync\w*|merged\w*|synced)(?: - copy)?$", re.IGNORECASE)
+
+
+def episode_key(name):
+    match = _EPISODE.search(name)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def pair_episodes(folder):
+    """
+    [(video, original_srt)] for the folder, in episode (then name) order.
+    <video stem>.srt wins, then <video stem>.<lang>.srt, then the one
+    untagged .srt sharing the video's SxxEyy. Videos without an original are
+    left out.
+    """
+    names = sorted(os.listdir(folder))
+    videos = [n for n in names if n.lower().endswith(VIDEO_EXTENSIONS)]
+    originals = [n for n in names if n.lower().endswith(".srt") and not _OUTPUT_TAGS.search(n[:-4])]
+
+    pairs = []
+    for video in videos:
+        stem = os.path.splitext(video)[0]
+        exact = [s for s in originals if s[:-4] == stem]
+        language = [s for s in originals if s.startswith(stem + ".") and _LANGUAGE.match(s[len(stem) + 1:-4])]
+        key = episode_key(video)
+        same_episode = [s for s in originals if key is not None and episode_key(s) == key]
+        match = (exact or language or (same_episode if len(same_episode) == 1 else []) or [None])[0]
+        if match:
+            pairs.append((os.path.join(folder, video), os.path.join(folder, match)))
+    pairs.sort(key=lambda pair: (episode_key(os.path.basename(pair[0])) or (999, 999), pair[0]))
+    return pairs
+
+
+class EpisodeReport:
+    def __init__(self, video, output=None, wall_s=0.0, duration_s=0.0, matched=None, cues=0, method="", error=None):
+        self.video = video
+        self.output = output
+        self.wall_s = wall_s
+        self.duration_s = duration_s
+        self.matched = matched
+        self.cues = cues
+        self.method = method
+        self.error = error
+
+    @property
+    def rtf(self):
+        return self.wall_s / self.duration_s if self.duration_s else None
+
+    @property
+    def ratio(self):
+        return self.matched / self.cues if self.matched is not None and self.cues else None
+
+
+def run_batch(core, pairs, output_for=None, on_report=None):
+    """
+    Sync every (video, original) pair with core, returning EpisodeReports.
+    Decoding of the next episode overlaps ASR of the current one; a failed
+    episode is reported and the batch carries on.
+    """
+    output_for = output_for or (lambda video, subtitle: output_name(None, subtitle))
+    if core.model_path:
+        MODEL_POOL.prewarm(core.model_path, **core.runtime)
+
+    def decode(video):
+        # Whole track into the PCM cache; the sync then memory-maps it
+        if core.pcm_cache.open(video) is None:
+            core.pcm_cache.load(video, core.ffmpeg_path).close()
+
+    reports = []
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-decode") as decoder:
+        pending = decoder.submit(decode, pairs[0][0]) if pairs else None
+        for n, (video, subtitle) in enumerate(pairs):
+            if core.stop_flag.is_set():
+                break
+            report = EpisodeReport(video, output_for(video, subtitle))
+            started = time.time()
+            # Queue the next decode now; the single decode thread starts it once this one is done
+            current, pending = pending, (decoder.submit(decode, pairs[n + 1][0]) if n + 1 < len(pairs) else None)
+            try:
+                current.result()
+                if core.stop_flag.is_set():  # Stop while waiting for the decode
+                    break
+                core.log("[INFO] Batch {}/{}: {}", n + 1, len(pairs), os.path.basename(video))
+                result = core.sync(video, subtitle, report.output)
+                report.method = result.method
+                report.matched = result.matched
+                report.cues = len(result.track)
+            except Exception as e:
+                report.error = f"{type(e).__name__}: {e}"
+                core.log("[ERROR] Batch: {} failed: {}", os.path.basename(video), report.error)
+            report.wall_s = time.time() - started
+            audio = core.pcm_cache.open(video)
+            if audio is not None:
+                report.duration_s = audio.duration
+                audio.close()
+            else:
+                report.duration_s = probe_duration(video, core.ffmpeg_path)
+            reports.append(report)
+            if on_report:
+                on_report(report)
+    return reports
+
+
+def format_summary(reports):
+    """Fixed-width summary table, one row per episode plus a total."""
+    rows = [("Episode", "Wall", "Audio", "RTF", "Matched", "Method")]
+    for r in reports:
+        name = os.path.splitext(os.path.basename(r.video))[0]
+        key = episode_key(name)
+        label = f"S{key[0]:02}E{key[1]:02}" if key else name[:40]
+        if r.error:
+            rows.append((label, f"{r.wall_s:.1f}s", "", "", "", f"failed: {r.error}"))
+            continue
+        rows.append((
+            label,
+            f"{r.wall_s:.1f}s",
+            f"{r.duration_s / 60:.1f}m" if r.duration_s else "?",
+            f"{r.rtf:.3f}" if r.rtf is not None else "?",
+            f"{r.matched}/{r.cues} ({r.ratio:.0%})" if r.ratio is not None else "—",
+            r.method
+        ))
+    wall = sum(r.wall_s for r in reports)
+    audio = sum(r.duration_s for r in reports if not r.error)
+    rows.append(("Total", f"{wall:.1f}s", f"{audio / 60:.1f}m", f"{wall / audio:.3f}" if audio else "?", "", ""))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,78 @@
+import os
+import random
+import time
+from datetime import datetime
+
+from srt_time import ms_to_srt_time, seconds_to_ms, srt_time_to_ms
+
+# Round-trip checks and throughput for the SRT timestamp codec, against the
+# datetime.strptime parser and float formatter it replaced.
+
+TESTSUBS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_Testsubs")
+
+
+def legacy_parse(ts):
+    t = datetime.strptime(ts.strip(), "%H:%M:%S,%f")
+    return t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1_000_000
+
+
+def legacy_format(seconds):
+    hrs = int(seconds // 3600)
+    mins = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    millis = int((seconds - int(seconds)) * 1000)
+    return f"{hrs:02}:{mins:02}:{secs:02},{millis:03}"
+
+
+# ─── Round trips ─────────────────────────────────────────────
+for ms in list(range(0, 200_000)) + [3_599_999, 3_600_000, 86_399_999, 359_999_999]:
+    assert srt_time_to_ms(ms_to_srt_time(ms)) == ms, ms
+
+stamps = []
+for root, _, files in os.walk(TESTSUBS):
+    for name in files:
+        if name.endswith(".srt"):
+            with open(os.path.join(root, name), encoding="utf-8-sig") as f:
+                for line in f:
+                    if "-->" in line:
+                        stamps.extend(t.strip() for t in line.split("-->"))
+for ts in stamps:
+    assert ms_to_srt_time(srt_time_to_ms(ts)) == ts, ts
+    assert srt_time_to_ms(ts) == round(legacy_parse(ts) * 1000), ts
+
+assert srt_time_to_ms("0:01:02.5") == 62_500
+assert srt_time_to_ms("100:00:00,000") == 360_000_000
+assert ms_to_srt_time(-40) == "00:00:00,000"
+
+# The float formatter truncates: 1.003 s came out as ,002 and 1.001 s as ,000
+drift = sum(legacy_format(n / 1000) != ms_to_srt_time(seconds_to_ms(n / 1000)) for n in range(100_000))
+print(f"✅ Round trips OK over {len(stamps):,} _Testsubs timestamps")
+print(f"🎯 Old float formatter was off by 1 ms on {drift:,} of 100,000 values")
+
+# ─── Throughput ──────────────────────────────────────────────
+sample = [ms_to_srt_time(random.randrange(0, 3 * 3_600_000)) for _ in range(100_000)]
+
+start = time.time()
+for ts in sample:
+    legacy_parse(ts)
+legacy_parse_time = time.time() - start
+
+start = time.time()
+for ts in sample:
+    srt_time_to_ms(ts)
+parse_time = time.time() - start
+print(f"🐢 strptime parse: {legacy_parse_time:.3f}s   ⚡ codec parse: {parse_time:.3f}s "
+      f"({legacy_parse_time / parse_time:.1f}× faster, 100k timestamps)")
+
+values = [srt_time_to_ms(ts) for ts in sample]
+start = time.time()
+for ms in values:
+    legacy_format(ms / 1000)
+legacy_format_time = time.time() - start
+
+start = time.time()
+for ms in values:
+    ms_to_srt_time(ms)
+format_time = time.time() - start
+print(f"🐢 float format: {legacy_format_time:.3f}s   ⚡ codec format: {format_time:.3f}s "
+      f"({legacy_format_time / format_time:.1f}× faster, 100k timestamps)")
@@ -0,0 +1,71 @@
+import os
+import re
+import time
+
+from matching import TokenVocab, overlap_score, token_match_score
+
+# Scores every original cue against every ASR chunk (chunk_size=8, step=1),
+# once with the old per-call tokenizer and once with cached token-ID sets.
+
+TESTSUBS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_Testsubs")
+EPISODE = "Everybody Loves Raymond (1996) - S09E14 - The Power of No (1080p AMZN WEB-DL x265 Silence)"
+ORIGINAL = os.path.join(TESTSUBS, EPISODE + ".srt")
+ASR = os.path.join(TESTSUBS, EPISODE + ".Whisper.srt")
+
+
+def read_texts(path):
+    texts, current = [], []
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                if current:
+                    texts.append(" ".join(current))
+                current = []
+            elif "-->" not in line and not line.isdigit():
+                current.append(line)
+    if current:
+        texts.append(" ".join(current))
+    return texts
+
+
+def legacy_score(original, candidate):
+    # token_match_score as it was: regex and both sets rebuilt on every call
+    def clean_token(token):
+        return re.sub(r"[^\w']+", "", token).lower()
+
+    if not original or not candidate:
+        return 0.0
+    a_words = set(clean_token(w) for w in original.split() if w.strip())
+    b_words = set(clean_token(w) for w in candidate.split() if w.strip())
+    return len(a_words & b_words) / max(len(a_words), 1)
+
+
+cues = read_texts(ORIGINAL)
+chunks = []
+for text in read_texts(ASR):
+    words = text.split()
+    for i in range(0, len(words) - 8 + 1, 1):
+        chunks.append(" ".join(words[i:i + 8]))
+print(f"📄 {len(cues)} cues × {len(chunks)} chunks = {len(cues) * len(chunks):,} scores")
+
+start = time.time()
+legacy = [[legacy_score(c, k) for k in chunks] for c in cues]
+legacy_time = time.time() - start
+print("🐢 Per-call tokenizing:", round(legacy_time, 3), "seconds")
+
+start = time.time()
+scalar = [[token_match_score(c, k) for k in chunks] for c in cues]
+print("🔁 token_match_score (precompiled regex):", round(time.time() - start, 3), "seconds")
+
+start = time.time()
+vocab = TokenVocab()
+chunk_ids = [vocab.encode(k) for k in chunks]
+cue_ids = [vocab.encode(c) for c in cues]
+tokenize_time = time.time() - start
+cached = [[overlap_score(c, k) for k in chunk_ids] for c in cue_ids]
+cached_time = time.time() - start
+print("⚡ Interned token sets:", round(cached_time, 3), "seconds", f"(tokenizing {tokenize_time:.3f})")
+
+assert legacy == scalar == cached, "scores differ between tokenizers"
+print(f"✅ Identical scores, {legacy_time / cached_time:.1f}× faster")
@@ -0,0 +1,206 @@
+# job_ledger.py
+#
+# SQLite record of every sync job: inputs, settings, per-stage timings
+# (ffmpeg, model_load, asr, merge, write), cue match counts and the output
+# path. It gives a throughput history, and a job whose process crashed or was
+# stopped can be resumed: "resume" re-runs the whole pipeline with the job's
+# recorded inputs and settings, and the stages that had completed are cheap
+# only because their results come back from the PCM and ASR caches. A stage
+# whose cache entry has since been evicted is simply done again.
+
+import json
+import os
+import platform
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+LEDGER_PATH = os.path.expanduser("~/.subtitle_sync_cache/jobs.sqlite")
+STAGES = ("ffmpeg", "model_load", "asr", "merge", "write")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind       TEXT NOT NULL,     -- asr / sync / sync-only
+    video      TEXT,
+    subtitle   TEXT,
+    asr_srt    TEXT,
+    output     TEXT,
+    settings   TEXT NOT NULL,     -- SyncSettings.as_dict() as JSON
+    state      TEXT NOT NULL,     -- running / done / failed / interrupted
+    last_stage TEXT,              -- last stage that completed
+    method     TEXT,
+    matched    INTEGER,
+    cues       INTEGER,
+    error      TEXT,
+    host       TEXT,
+    pid        INTEGER,
+    started    REAL NOT NULL,
+    finished   REAL,
+    resumes    INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS stages (
+    job_id   INTEGER NOT NULL REFERENCES jobs(id),
+    stage    TEXT NOT NULL,
+    seconds  REAL NOT NULL,
+    finished REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stages_job ON stages(job_id);
+"""
+
+
+def process_alive(pid):
+    """Whether pid is a running process on this machine."""
+    if not pid:
+        return False
+    if pid == os.getpid():
+        return True
+    if sys.platform == "win32":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobLedger:
+    """
+    One connection per call, so SyncCores on any thread (batch, watch, the job
+    server) can share a ledger. A write that fails (locked, read-only disk) is
+    logged and skipped; the ledger never fails a sync. If the database cannot
+    be created at all the ledger is disabled: nothing is recorded and the
+    queries come back empty.
+    """
+
+    def __init__(self, path=LEDGER_PATH, log=None):
+        self.path = path
+        self.log = log or (lambda text: print(text, flush=True))
+        self.enabled = True
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._connect() as db:
+                db.executescript(SCHEMA)
+        except (OSError, sqlite3.Error) as e:
+            self.log(f"[WARN] Job ledger disabled: {e}")
+            self.enabled = False
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:  # commit, or roll back on error
+                yield db
+        finally:
+            db.close()
+
+    def _write(self, sql, params=()):
+        if not self.enabled:
+            return None
+        try:
+            with self._connect() as db:
+                return db.execute(sql, params).lastrowid
+        except sqlite3.Error as e:
+            self.log(f"[WARN] Job ledger: {e}")
+            return None
+
+    # ─── Recording ──────────────────────────────────────────
+    def start(self, kind, settings, video=None, subtitle=None, asr_srt=None, output=None):
+        """New running job; returns its id (None if the ledger could not be written)."""
+        return self._write(
+            "INSERT INTO jobs (kind, video, subtitle, asr_srt, output, settings, state, host, pid, started) "
+            "VALUES (?, ?, ?, ?, ?, ?, 'running', ?, ?, ?)",
+            (kind, video, subtitle, asr_srt, output, json.dumps(settings), platform.node(), os.getpid(), time.time())
+        )
+
+    def reopen(self, job_id):
+        """Mark an interrupted job running again, in this process."""
+        self._write(
+            "UPDATE jobs SET state = 'running', error = NULL, finished = NULL, host = ?, pid = ?, resumes = resumes + 1 WHERE id = ?",
+            (platform.node(), os.getpid(), job_id)
+        )
+
+    def stage_done(self, job_id, stage, seconds):
+        now = time.time()
+        self._write("INSERT INTO stages (job_id, stage, seconds, finished) VALUES (?, ?, ?, ?)", (job_id, stage, seconds, now))
+        self._write("UPDATE jobs SET last_stage = ? WHERE id = ?", (stage, job_id))
+
+    def finish(self, job_id, state, method=None, matched=None, cues=None, error=None):
+        self._write(
+            "UPDATE jobs SET state = ?, method = ?, matched = ?, cues = ?, error = ?, finished = ? WHERE id = ?",
+            (state, method, matched, cues, error, time.time(), job_id)
+        )
+
+    # ─── Queries ────────────────────────────────────────────
+    def job(self, job_id):
+        """The job as a dict (settings decoded, stage totals under "stages"), or None."""
+        if not self.enabled:
+            return None
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            return self._job_dict(db, row)
+
+    def jobs(self, limit=50, state=None):
+        """Most recent jobs first, optionally only those in state."""
+        if not self.enabled:
+            return []
+        sql = "SELECT * FROM jobs" + (" WHERE state = ?" if state else "") + " ORDER BY id DESC LIMIT ?"
+        with self._connect() as db:
+            rows = db.execute(sql, (state, limit) if state else (limit,)).fetchall()
+            return [self._job_dict(db, row) for row in rows]
+
+    def resumable(self):
+        """
+        Interrupted jobs, plus jobs still marked running whose process on this
+        machine has died (a crash never gets to mark them). Most recent first.
+        """
+        if not self.enabled:
+            return []
+        with self._connect() as db:
+            rows = db.execute("SELECT * FROM jobs WHERE state IN ('interrupted', 'running') ORDER BY id DESC").fetchall()
+            return [
+                self._job_dict(db, row) for row in rows
+                if row["state"] == "interrupted" or (row["host"] == platform.node() and not process_alive(row["pid"]))
+            ]
+
+    @staticmethod
+    def _job_dict(db, row):
+        job = dict(row)
+        job["settings"] = json.loads(job["settings"])
+        job["stages"] = {
+            stage: seconds for stage, seconds in
+            db.execute("SELECT stage, SUM(seconds) FROM stages WHERE job_id = ? GROUP BY stage", (row["id"],))
+        }
+        return job
+
+
+def format_jobs(jobs):
+    """Fixed-width table of jobs with their stage timings, like batch_sync.format_summary."""
+    rows = [("Job", "State", "Kind", "Name", "Matched") + STAGES + ("Total",)]
+    for job in jobs:
+        name = os.path.basename(job["video"] or job["subtitle"] or "")
+        matched = f"{job['matched']}/{job['cues']}" if job["matched"] is not None else (job["method"] or "")
+        total = (job["finished"] or time.time()) - job["started"]
+        rows.append(
+            (str(job["id"]), job["state"], job["kind"], name[:40], matched)
+            + tuple(f"{job['stages'][s]:.1f}s" if s in job["stages"] else "" for s in STAGES)
+            + (f"{total:.1f}s",)
+        )
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,413 @@
+# job_server.py
+#
+# Local HTTP/JSON job API around sync_core, for media tooling:
+#
+#   POST   /jobs               {"video", "subtitle", "mode", "priority", "output", "settings"} → 202 job
+#   GET    /jobs               all jobs, newest first
+#   GET    /jobs/<id>          one job's state
+#   GET    /jobs/<id>/events   server-sent events: stage, segment (the ASR preview rows), done / failed / cancelled
+#   GET    /jobs/<id>/srt      the output SRT once the job is done
+#   DELETE /jobs/<id>          cancel (queued jobs never start, a running one stops transcribing)
+#
+# Jobs wait in a priority queue (higher priority first, then submission order)
+# and `jobs` of them run at a time, sharing MODEL_POOL.
+#
+# The API is for local tools only. Requests must carry a local Host (and
+# Origin, if any), so web pages and DNS rebinding can't reach it. POST bodies
+# must be application/json, which a page can't send cross-origin without a
+# preflight. An "output" is written only beside the job's video (its subtitle
+# for sync-only) or under output_root. With stub=True no model
+# or audio is touched: the "ASR" is the job's own subtitle shifted by
+# stub_offset_ms, so a sync job must come back retimed by exactly that much.
+
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from asr_cache import CachedSegment, CachedWord
+from srt_time import ms_to_srt_time
+from subtitle_track import SubtitleTrack
+from sync_core import SyncCore, SyncSettings, read_track
+
+MODES = ("sync", "asr", "sync-only")
+TERMINAL = ("done", "failed", "cancelled")
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+def is_within(path, folder):
+    path, folder = os.path.realpath(path), os.path.realpath(folder)
+    return os.path.commonpath([path, folder]) == folder
+
+
+class StubCore(SyncCore):
+    """SyncCore whose transcription is the subtitle itself, shifted; for offline tests of the API."""
+
+    def __init__(self, script_path, offset_ms, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.script_path = script_path
+        self.offset_ms = offset_ms
+
+    def transcribe_video(self, video, windows=None, model_path=None):
+        track = read_track(self.script_path).shifted(self.offset_ms)
+        duration = max(track.ends) / 1000 if len(track) else None
+        segments = []
+        for start, end, text in zip(track.starts.tolist(), track.ends.tolist(), track.texts):
+            words = text.split()
+            step = (end - start) / max(len(words), 1)
+            segment = CachedSegment(
+                start / 1000, end / 1000, " " + text,
+                [CachedWord((start + n * step) / 1000, (start + (n + 1) * step) / 1000, " " + w, 1.0) for n, w in enumerate(words)],
+                -0.1
+            )
+            segments.append(segment)
+            if self.on_segment:
+                self.on_segment(segment, duration)
+            if self.stop_flag.is_set():
+                break
+        return segments
+
+    def probe(self, video, original):
+        return None
+
+
+class Job:
+    def __init__(self, request, priority=0):
+        self.id = uuid.uuid4().hex[:12]
+        self.request = request
+        self.priority = priority
+        self.state = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.stage = None
+        self.percent = 0.0
+        self.segments = 0
+        self.matched = None
+        self.cues = None
+        self.output = request.get("output")
+        self.srt = None
+        self.error = None
+        self.stop_flag = threading.Event()
+        self.events = []  # (event, data); SSE ids are positions in this list
+        self.changed = threading.Condition()
+
+    def emit(self, event, data):
+        with self.changed:
+            self.events.append((event, data))
+            self.changed.notify_all()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "state": self.state,
+            "mode": self.request.get("mode", "sync"),
+            "priority": self.priority,
+            "video": self.request.get("video"),
+            "subtitle": self.request.get("subtitle"),
+            "output": self.output,
+            "stage": self.stage,
+            "percent": round(self.percent, 1),
+            "segments": self.segments,
+            "matched": self.matched,
+            "cues": self.cues,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class JobQueue:
+    """
+    Priority queue of Jobs run by `workers` threads; core_for() builds each
+    job's SyncCore (a StubCore with stub=True). Outputs may only be written
+    beside a job's inputs or under output_root.
+    """
+
+    def __init__(self, model_path=None, ffmpeg_path="ffmpeg", draft_model_path=None, defaults=None,
+                 workers=1, stub=False, stub_offset_ms=2500, ledger=None, output_root=None, log=None):
+        self.model_path = model_path
+        self.ffmpeg_path = ffmpeg_path
+        self.draft_model_path = draft_model_path
+        self.defaults = dict(defaults or {})
+        self.stub = stub
+        self.stub_offset_ms = stub_offset_ms
+        self.ledger = ledger
+        self.output_root = output_root
+        self.log = log or (lambda text: print(text, flush=True))
+        self.jobs = {}
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._work, name=f"job-worker-{n}", daemon=True) for n in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    # ─── Submission ─────────────────────────────────────────
+    def submit(self, request):
+        """Validate a request dict and queue it; ValueError on a bad request."""
+        mode = request.get("mode", "sync")
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        needed = {"sync": ("video", "subtitle"), "asr": ("video",), "sync-only": ("subtitle", "asr_srt")}[mode]
+        for field in needed:
+            path = request.get(field)
+            if not isinstance(path, str) or not os.path.isfile(path):
+                raise ValueError(f"{field}: file not found: {path!r}")
+        settings = request.get("settings") or {}
+        if not isinstance(settings, dict):
+            raise ValueError("settings must be an object")
+        try:
+            SyncSettings(**{**self.defaults, **settings})
+        except TypeError as e:
+            raise ValueError(str(e))
+        try:
+            priority = int(request.get("priority", 0))
+        except (TypeError, ValueError):
+            raise ValueError("priority must be an integer")
+        if request.get("output") is not None:
+            request = dict(request, output=self.checked_output(request, mode))
+
+        job = Job(request, priority)
+        with self._lock:
+            self.jobs[job.id] = job
+        self._queue.put((-priority, next(self._order), job.id))
+        job.emit("queued", job.to_dict())
+        self.log(f"[INFO] Job {job.id} queued ({mode}, priority {priority})")
+        return job
+
+    def checked_output(self, request, mode):
+        """Absolute output path, or ValueError unless it is an .srt beside the input or under output_root."""
+        output = request["output"]
+        if not isinstance(output, str) or not output.lower().endswith(".srt"):
+            raise ValueError("output must be a path ending in .srt")
+        output = os.path.realpath(output)
+        inputs = [request.get(field) for field in ("video", "subtitle", "asr_srt") if request.get(field)]
+        if any(os.path.realpath(path) == output for path in inputs):
+            raise ValueError("output must not overwrite an input file")
+        beside = os.path.dirname(os.path.realpath(request["subtitle" if mode == "sync-only" else "video"]))
+        if os.path.dirname(output) != beside and not (self.output_root and is_within(output, self.output_root)):
+            where = f"{beside} or under {self.output_root}" if self.output_root else beside
+            raise ValueError(f"output must be in {where}")
+        return output
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        # Under the lock a worker either has not claimed the job yet (it never
+        # will) or has, and its core sees the flag: SyncCore never clears a
+        # caller's stop flag
+        with self._lock:
+            job.stop_flag.set()
+            queued = job.state == "queued"
+            if queued:
+                job.state = "cancelled"
+        if queued:
+            self._finish(job, "cancelled")
+        return job
+
+    # ─── Workers ────────────────────────────────────────────
+    def core_for(self, job, settings):
+        callbacks = dict(
+            stop_flag=job.stop_flag,
+            ledger=self.ledger,
+            log=self.log,
+            on_stage=lambda text: self._stage(job, text),
+            on_segment=lambda segment, duration: self._segment(job, segment, duration),
+            on_preview=lambda segments: [self._segment(job, segment, None) for segment in segments if segment.text.strip()],
+        )
+        if self.stub:
+            script = job.request.get("subtitle") or job.request.get("asr_srt")
+            return StubCore(script, self.stub_offset_ms, settings, self.model_path, self.ffmpeg_path, **callbacks)
+        return SyncCore(settings, self.model_path, self.ffmpeg_path, self.draft_model_path, **callbacks)
+
+    def _work(self):
+        while True:
+            _, _, job_id = self._queue.get()
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if job is None or job.state != "queued":
+                    continue  # cancelled while waiting
+                job.state = "running"
+            self._run(job)
+
+    def _run(self, job):
+        request = job.request
+        mode = request.get("mode", "sync")
+        job.started = time.time()
+        job.emit("started", job.to_dict())
+        try:
+            settings = SyncSettings(**{**self.defaults, **(request.get("settings") or {})})
+            core = self.core_for(job, settings)
+            if mode == "asr":
+                track = SubtitleTrack.from_segments(core.asr(request["video"], job.output))
+            elif mode == "sync":
+                result = core.sync(request["video"], request["subtitle"], job.output)
+                track, job.matched = result.track, result.matched
+            else:
+                result = core.sync_only(request["subtitle"], request["asr_srt"], job.output)
+                track, job.matched = result.track, result.matched
+            job.cues = len(track)
+            job.srt = "".join(track.to_srt_lines())
+            if job.stop_flag.is_set():
+                self._finish(job, "cancelled")
+            else:
+                job.percent = 100.0
+                self._finish(job, "done")
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            self.log(f"[ERROR] Job {job.id} failed: {job.error}")
+            self._finish(job, "failed")
+
+    def _finish(self, job, state):
+        job.state = state
+        job.finished = time.time()
+        job.emit(state, job.to_dict())
+        self.log(f"[INFO] Job {job.id} {state}")
+
+    def _stage(self, job, text):
+        job.stage = text
+        job.emit("stage", {"stage": text})
+
+    def _segment(self, job, segment, duration):
+        # The same row the GUI's ASR preview pane shows, plus progress
+        job.segments += 1
+        job.percent = min(segment.end / duration * 100, 100) if duration else job.percent
+        job.emit("segment", {
+            "index": job.segments,
+            "start": segment.start,
+            "end": segment.end,
+            "timestamp": f"{ms_to_srt_time(int(round(segment.start * 1000)))} --> {ms_to_srt_time(int(round(segment.end * 1000)))}",
+            "text": segment.text.strip()[:80],
+            "percent": round(job.percent, 1),
+        })
+
+
+# ─── HTTP ───────────────────────────────────────────────────
+class JobHandler(BaseHTTPRequestHandler):
+    server_version = "SubtitleSync"
+    keepalive_s = 15.0
+
+    @property
+    def jobs(self):
+        return self.server.jobs
+
+    def log_message(self, fmt, *args):
+        self.jobs.log("[HTTP] " + fmt % args)
+
+    def _local_request(self):
+        """Host (and Origin, when sent) name this machine; refuses browsers on other sites and DNS rebinding."""
+        allowed = set(LOCAL_HOSTS) | {self.server.server_address[0]}
+        host = urlparse("//" + (self.headers.get("Host") or "")).hostname
+        if host not in allowed:
+            return False
+        origin = self.headers.get("Origin")
+        return origin is None or urlparse(origin).hostname in allowed
+
+    def _send(self, status, body, content_type="application/json"):
+        data = (json.dumps(body, indent=2) + "\n").encode("utf-8") if content_type == "application/json" else body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self):
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        if not parts or parts[0] != "jobs":
+            return None, None, parts
+        job = self.jobs.jobs.get(parts[1]) if len(parts) > 1 else None
+        return job, parts[2] if len(parts) > 2 else None, parts
+
+    def do_POST(self):
+        if not self._local_request():
+            return self._send(403, {"error": "only local clients may use this API"})
+        _, _, parts = self._route()
+        if parts != ["jobs"]:
+            return self._send(404, {"error": "not found"})
+        if (self.headers.get("Content-Type") or "").split(";")[0].strip().lower() != "application/json":
+            return self._send(415, {"error": "Content-Type must be application/json"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("request body must be a JSON object")
+            job = self.jobs.submit(request)
+        except ValueError as e:  # includes JSONDecodeError
+            return self._send(400, {"error": str(e)})
+        self._send(202, dict(job.to_dict(), events=f"/jobs/{job.id}/events", srt=f"/jobs/{job.id}/srt"))
+
+    def do_GET(self):
+        if not self._local_request():
+            return self._send(403, {"error": "only local clients may use this API"})
+        job, action, parts = self._route()
+        if parts == ["jobs"]:
+            jobs = sorted(self.jobs.jobs.values(), key=lambda j: j.created, reverse=True)
+            return self._send(200, [j.to_dict() for j in jobs])
+        if job is None or len(parts) > 3:
+            return self._send(404, {"error": "no such job"})
+        if action is None:
+            return self._send(200, job.to_dict())
+        if action == "srt":
+            if job.state != "done":
+                return self._send(409, {"error": f"job is {job.state}", "state": job.state})
+            return self._send(200, job.srt, "application/x-subrip")
+        if action == "events":
+            return self._stream(job)
+        self._send(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        if not self._local_request():
+            return self._send(403, {"error": "only local clients may use this API"})
+        job, action, _ = self._route()
+        if job is None or action is not None:
+            return self._send(404, {"error": "no such job"})
+        self.jobs.cancel(job.id)
+        self._send(200, job.to_dict())
+
+    def _stream(self, job):
+        """Replay the job's events from Last-Event-ID (or the start), then follow it to the end."""
+        try:
+            position = int(self.headers.get("Last-Event-ID", -1)) + 1
+        except ValueError:
+            position = 0
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            while True:
+                with job.changed:
+                    if position >= len(job.events):
+                        job.changed.wait(self.keepalive_s)
+                    pending = job.events[position:]
+                if not pending:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+                    continue
+                for event, data in pending:
+                    self.wfile.write(f"id: {position}\nevent: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+                    position += 1
+                    if event in TERMINAL:
+                        self.wfile.flush()
+                        return
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away
+
+
+def make_server(jobs, host="127.0.0.1", port=8765):
+    """ThreadingHTTPServer serving `jobs` (a JobQueue); call serve_forever()."""
+    server = ThreadingHTTPServer((host, port), JobHandler)
+    server.daemon_threads = True
+    server.jobs = jobs
+    return server
@@ -0,0 +1,275 @@
+# matching.py
+#
+# Candidate search for merge_subtitles(): scores original cues against ASR chunks.
+
+import re
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+
+# Remove punctuation but preserve contractions (e.g., "don't")
+_NON_WORD = re.compile(r"[^\w']+")
+
+
+def clean_token(token):
+    return _NON_WORD.sub("", token).lower()
+
+
+def token_set(text):
+    """Return the set of cleaned tokens in a line of subtitle text."""
+    return set(clean_token(w) for w in text.split())
+
+
+def token_match_score(original, candidate):
+    """Share of the original's tokens that also appear in the candidate (0.0–1.0)."""
+    if not original or not candidate:
+        return 0.0
+
+    a_words = token_set(original)
+    b_words = token_set(candidate)
+
+    shared = a_words & b_words
+    return len(shared) / max(len(a_words), 1)
+
+
+def overlap_score(a_ids, b_ids):
+    """token_match_score() on pre-tokenized sets: |A ∩ B| / |A|."""
+    return len(a_ids & b_ids) / max(len(a_ids), 1)
+
+
+class TokenVocab:
+    """
+    Interns cleaned tokens as small ints, shared by one merge's cues and chunks.
+
+    tokens_for() normalizes every cue of a SubtitleTrack once and caches the
+    frozensets of token IDs on the track, so scoring never touches the regex.
+    """
+
+    def __init__(self):
+        self.ids = {}
+
+    def encode(self, text):
+        ids = self.ids
+        return frozenset(ids.setdefault(t, len(ids)) for t in map(clean_token, text.split()))
+
+    def tokens_for(self, track):
+        if track.tokens is None or track.token_vocab is not self:
+            track.tokens = [self.encode(text) for text in track.texts]
+            track.token_vocab = self
+        return track.tokens
+
+
+def search_windows(start_ms, end_ms, tolerance_ms, widen_steps=3):
+    """
+    Yield (lo_ms, hi_ms) windows to try for one cue: the cue ± tolerance first,
+    then progressively wider fallbacks (2×, 4×, 8× …) for cues with no match.
+    """
+    yield start_ms - tolerance_ms, end_ms + tolerance_ms
+    base = max(tolerance_ms, 1000)
+    for k in range(1, widen_steps + 1):
+        pad = base * (2 ** k)
+        yield start_ms - pad, end_ms + pad
+
+
+def best_chunk_exhaustive(words, chunks, min_score, window=None):
+    """
+    Score a cue's token set against every chunk and return (best_pos, best_score).
+    The first chunk wins a tie; nothing below min_score is returned.
+    With window=(lo_ms, hi_ms) only chunks starting inside it are scored.
+    chunks is a SubtitleTrack already tokenized by the same TokenVocab.
+    """
+    best_pos = None
+    best_score = 0.0
+
+    if not words:
+        return best_pos, best_score
+
+    starts = chunks.starts.tolist() if window else None
+    for pos, tokens in enumerate(chunks.tokens):
+        if window and not (window[0] <= starts[pos] <= window[1]):
+            continue
+        score = overlap_score(words, tokens)
+        if score > best_score and score >= min_score:
+            best_score = score
+            best_pos = pos
+
+    return best_pos, best_score
+
+
+class ChunkIndex:
+    """
+    Token → chunk inverted index, built once per ASR track.
+
+    best_match() only scores chunks that share at least one cleaned token with
+    the cue, and returns exactly what best_chunk_exhaustive() would.
+    """
+
+    def __init__(self, chunks, vocab):
+        self.tokens = vocab.tokens_for(chunks)
+        self.postings = {}
+        for pos, words in enumerate(self.tokens):
+            for token in words:
+                self.postings.setdefault(token, []).append(pos)
+
+        # Chunk positions sorted by start time, for bisecting time windows
+        chunk_starts = chunks.starts.tolist()
+        self.by_start = sorted(range(len(chunks)), key=lambda pos: (chunk_starts[pos], pos))
+        self.starts = [chunk_starts[pos] for pos in self.by_start]
+
+    def in_window(self, lo_ms, hi_ms):
+        """Positions of chunks starting inside [lo_ms, hi_ms], in chunk order."""
+        lo = bisect_left(self.starts, lo_ms)
+        hi = bisect_right(self.starts, hi_ms)
+        return sorted(self.by_start[lo:hi])
+
+    def best_match(self, words, min_score, window=None):
+        if not words:
+            return None, 0.0
+
+        hits = {}
+        if window:
+            for pos in self.in_window(*window):
+                shared = len(words & self.tokens[pos])
+                if shared:
+                    hits[pos] = shared
+        else:
+            for token in words:
+                for pos in self.postings.get(token, ()):
+                    hits[pos] = hits.get(pos, 0) + 1
+
+        best_pos = None
+        best_score = 0.0
+        total = max(len(words), 1)
+
+        # Walk candidates in chunk order so ties resolve like the full scan
+        for pos in sorted(hits):
+            score = hits[pos] / total
+            if score > best_score and score >= min_score:
+                best_score = score
+                best_pos = pos
+
+        return best_pos, best_score
+
+
+class SparseScorer:
+    """
+    Vectorized candidate search: scores whole blocks of cues against all chunks
+    with one sparse (cue × term) · (term × chunk) product per block.
+
+    Returns the same picks as best_chunk_exhaustive(): highest score, first
+    chunk on a tie, nothing below min_score. Uses scipy.sparse when installed
+    and a NumPy-only postings expansion otherwise. block_rows bounds memory.
+    """
+
+    def __init__(self, chunks, vocab, block_rows=512):
+        self.n_chunks = len(chunks)
+        self.block_rows = block_rows
+        self.starts = np.asarray(chunks.starts, dtype=np.int64)
+
+        chunk_rows, term_cols = [], []
+        for pos, ids in enumerate(vocab.tokens_for(chunks)):
+            chunk_rows.extend([pos] * len(ids))
+            term_cols.extend(ids)
+        chunk_rows = np.array(chunk_rows, dtype=np.int64)
+        term_cols = np.array(term_cols, dtype=np.int64)
+        self.n_terms = len(vocab.ids)
+
+        if sparse is not None:
+            self.term_chunk = sparse.csr_matrix(
+                (np.ones(len(chunk_rows), dtype=np.int32), (term_cols, chunk_rows)),
+                shape=(self.n_terms, self.n_chunks)
+            )
+        else:
+            # term → chunk postings in CSR layout
+            order = np.lexsort((chunk_rows, term_cols))
+            self.post_chunks = chunk_rows[order]
+            self.post_ptr = np.searchsorted(term_cols[order], np.arange(self.n_terms + 1))
+
+    def _overlaps(self, rows, terms, n_rows):
+        """(cue row, chunk, shared-token count) for every overlapping pair."""
+        if sparse is not None:
+            cue_term = sparse.csr_matrix(
+                (np.ones(len(rows), dtype=np.int32), (rows, terms)),
+                shape=(n_rows, self.n_terms)
+            )
+            product = (cue_term @ self.term_chunk).tocoo()
+            return product.row.astype(np.int64), product.col.astype(np.int64), product.data
+
+        lengths = self.post_ptr[terms + 1] - self.post_ptr[terms]
+        total = int(lengths.sum())
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        chunk_ids = self.post_chunks[np.repeat(self.post_ptr[terms], lengths) + offsets]
+        keys = np.repeat(rows, lengths) * self.n_chunks + chunk_ids
+        keys, counts = np.unique(keys, return_counts=True)
+        return keys // self.n_chunks, keys % self.n_chunks, counts
+
+    def best_matches(self, cue_tokens, min_score, windows=None):
+        """
+        Best (chunk position, score) per cue token set; windows is an optional list of
+        (lo_ms, hi_ms) per cue limiting which chunk starts count.
+        """
+        picks = [(None, 0.0)] * len(cue_tokens)
+
+        for first in range(0, len(cue_tokens), self.block_rows):
+            block = cue_tokens[first:first + self.block_rows]
+            sizes = np.array([max(len(ids), 1) for ids in block], dtype=np.int64)
+
+            rows, terms = [], []
+            for row, ids in enumerate(block):
+                known = [t for t in ids if t < self.n_terms]
+                rows.extend([row] * len(known))
+                terms.extend(known)
+            if not rows:
+                continue
+
+            row, col, shared = self._overlaps(
+                np.array(rows, dtype=np.int64), np.array(terms, dtype=np.int64), len(block)
+            )
+            score = shared / sizes[row]
+            keep = score >= min_score
+            if windows is not None:
+                lo = np.array([w[0] for w in windows[first:first + len(block)]], dtype=np.int64)
+                hi = np.array([w[1] for w in windows[first:first + len(block)]], dtype=np.int64)
+                keep &= (self.starts[col] >= lo[row]) & (self.starts[col] <= hi[row])
+            row, col, score = row[keep], col[keep], score[keep]
+
+            # Per row: highest score, then lowest chunk position
+            order = np.lexsort((col, -score, row))
+            row, col, score = row[order], col[order], score[order]
+            leaders = np.ones(len(row), dtype=bool)
+            leaders[1:] = row[1:] != row[:-1]
+            for r, c, sc in zip(row[leaders].tolist(), col[leaders].tolist(), score[leaders].tolist()):
+                picks[first + r] = (c, sc)
+
+        return picks
+
+    def best_matches_widening(self, cue_tokens, min_score, cue_windows):
+        """
+        best_matches() over each cue's list of search_windows(), retrying only
+        the cues still unmatched. Returns (chunk position, score, attempt) per cue.
+        """
+        picks = [(None, 0.0, 0)] * len(cue_tokens)
+        pending = list(range(len(cue_tokens)))
+        attempt = 0
+        while pending:
+            batch = [p for p in pending if attempt < len(cue_windows[p])]
+            if not batch:
+                break
+            windows = [cue_windows[p][attempt] for p in batch]
+            if all(w is None for w in windows):
+                windows = None
+            found = self.best_matches([cue_tokens[p] for p in batch], min_score, windows)
+            pending = []
+            for p, (pos, score) in zip(batch, found):
+                if pos is not None:
+                    picks[p] = (pos, score, attempt)
+                else:
+                    pending.append(p)
+            attempt += 1
+        return picks
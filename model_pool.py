@@ -0,0 +1,177 @@
+# model_pool.py
+#
+# Process-wide cache of loaded WhisperModels, so repeat jobs skip the
+# multi-second model load.
+
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+def _load_whisper(path, device, compute_type, cpu_threads, num_workers=1):
+    from faster_whisper import WhisperModel  # type: ignore
+    return WhisperModel(path, device=device, compute_type=compute_type, cpu_threads=cpu_threads, num_workers=num_workers)
+
+
+def _model_size_mb(path):
+    """Rough resident size of a model: its files on disk (int8 weights load ~1:1)."""
+    if not os.path.isdir(path):
+        return 0
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total // (1024 * 1024)
+
+
+class ModelPool:
+    """
+    Loaded models keyed by (path, device, compute_type, cpu_threads, num_workers).
+
+    lease() hands out a model and keeps it pinned while in use. Idle models
+    are evicted after idle_timeout seconds, and least-recently-used idle
+    models are dropped before a load would exceed memory_budget_mb.
+    Concurrent requests for the same key share a single load.
+    """
+
+    def __init__(self, idle_timeout=900, memory_budget_mb=0, loader=_load_whisper):
+        self.idle_timeout = idle_timeout
+        self.memory_budget_mb = memory_budget_mb  # 0 = no budget
+        self.loader = loader
+        self._entries = {}   # key -> {"model", "size_mb", "last_used", "in_use"}
+        self._loading = {}   # key -> Event set when the load finishes
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    @staticmethod
+    def key(path, device="auto", compute_type="int8", cpu_threads=0, num_workers=1):
+        return (os.path.abspath(path) if os.path.exists(path) else path, device, compute_type, int(cpu_threads), int(num_workers))
+
+    # ─── Lookup ─────────────────────────────────────────────
+    def get(self, path, device="auto", compute_type="int8", cpu_threads=0, num_workers=1):
+        """Return a loaded model, loading it if needed. Does not pin it."""
+        return self._acquire(self.key(path, device, compute_type, cpu_threads, num_workers))["model"]
+
+    @contextmanager
+    def lease(self, path, device="auto", compute_type="int8", cpu_threads=0, num_workers=1):
+        """with pool.lease(path) as model: … — pinned against eviction meanwhile."""
+        entry = self._acquire(self.key(path, device, compute_type, cpu_threads, num_workers), pin=True)
+        try:
+            yield entry["model"]
+        finally:
+            with self._lock:
+                entry["in_use"] -= 1
+                entry["last_used"] = time.time()
+
+    def _acquire(self, key, pin=False):
+        # The entry is found (or stored) and pinned under one hold of the lock,
+        # so the reaper can never evict it between lookup and pin
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry:
+                    entry["last_used"] = time.time()
+                    entry["in_use"] += pin
+                    return entry
+                pending = self._loading.get(key)
+                if pending is None:
+                    pending = self._loading[key] = threading.Event()
+                    break
+            pending.wait()  # someone else is loading it; pick up their result
+
+        try:
+            size_mb = _model_size_mb(key[0])
+            self._make_room(size_mb)
+            started = time.time()
+            model = self.loader(*key)
+            log.info("Loaded model %s (%s, %s threads) in %.1fs", key[0], key[2], key[3] or "auto", time.time() - started)
+            entry = {"model": model, "size_mb": size_mb, "last_used": time.time(), "in_use": int(pin)}
+            with self._lock:
+                self._entries[key] = entry
+            self._start_reaper()
+            return entry
+        finally:
+            with self._lock:
+                self._loading.pop(key).set()
+
+    def prewarm(self, path, device="auto", compute_type="int8", cpu_threads=0, num_workers=1):
+        """Load a model on a background thread; returns the thread."""
+        def warm():
+            try:
+                self.get(path, device, compute_type, cpu_threads, num_workers)
+            except Exception as e:
+                log.warning("Model prewarm failed for %s: %s", path, e)
+
+        thread = threading.Thread(target=warm, name="model-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def loaded(self):
+        with self._lock:
+            return list(self._entries)
+
+    # ─── Eviction ───────────────────────────────────────────
+    def evict_idle(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if not entry["in_use"] and self.idle_timeout and now - entry["last_used"] > self.idle_timeout
+            ]
+            for key in stale:
+                del self._entries[key]
+        for key in stale:
+            log.info("Evicted idle model %s (%s)", key[0], key[2])
+        return stale
+
+    def clear(self):
+        with self._lock:
+            self._entries = {key: e for key, e in self._entries.items() if e["in_use"]}
+
+    def _make_room(self, needed_mb):
+        if not self.memory_budget_mb:
+            return
+        with self._lock:
+            used = sum(e["size_mb"] for e in self._entries.values())
+            idle = sorted(
+                (e["last_used"], key) for key, e in self._entries.items() if not e["in_use"]
+            )
+            while idle and used + needed_mb > self.memory_budget_mb:
+                _, key = idle.pop(0)
+                used -= self._entries.pop(key)["size_mb"]
+                log.info("Evicted model %s to stay under %d MB", key[0], self.memory_budget_mb)
+
+    def _start_reaper(self):
+        with self._lock:
+            if self._reaper or not self.idle_timeout:
+                return
+            self._reaper = threading.Thread(target=self._reap, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(max(5, min(60, self.idle_timeout / 4 if self.idle_timeout else 60)))
+            self.evict_idle()
+
+
+# One pool per process; the GUI, CLI and batch runners all share it
+MODEL_POOL = ModelPool()
+
+
+def batched_pipeline(model):
+    """
+    faster-whisper's BatchedInferencePipeline around a (pooled) model, or None
+    if the installed faster-whisper predates it. Cheap to build per run.
+    """
+    try:
+        from faster_whisper import BatchedInferencePipeline  # type: ignore
+    except ImportError:
+        return None
+    return BatchedInferencePipeline(model=model)
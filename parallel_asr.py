@@ -0,0 +1,151 @@
+# parallel_asr.py
+#
+# Parallel chunked transcription: the decoded track is split into overlapping
+# windows that worker processes transcribe side by side, each with its own
+# model and a share of the cores. Segments the overlaps produce twice are
+# stitched out, and results are yielded in time order as windows finish.
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from asr_cache import CachedSegment, CachedWord
+from audio_stream import SAMPLE_RATE
+from matching import token_match_score
+
+
+def split_windows(duration_s, window_s=300.0, overlap_s=15.0):
+    """(start_s, end_s) windows covering duration_s, each overlapping the next by overlap_s."""
+    if duration_s <= window_s:
+        return [(0.0, duration_s)]
+    step = window_s - overlap_s
+    windows = []
+    start = 0.0
+    while start + overlap_s < duration_s:
+        windows.append((start, min(start + window_s, duration_s)))
+        start += step
+    return windows
+
+
+# ─── Worker side ────────────────────────────────────────────
+_worker = {}
+
+
+def _init_worker(model_path, compute_type, cpu_threads):
+    from model_pool import MODEL_POOL
+    _worker["model"] = MODEL_POOL.get(model_path, compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def _transcribe_window(source, start_s, end_s, options):
+    """Transcribe one window; source is the PCM cache file (memmapped here) or an int16 array."""
+    samples = np.memmap(source, dtype=np.int16, mode="r") if isinstance(source, str) else source
+    audio = samples[int(start_s * SAMPLE_RATE):int(end_s * SAMPLE_RATE)].astype(np.float32) / 32768.0
+    segments, _ = _worker["model"].transcribe(audio, **options)
+    # Plain namedtuples pickle cheaply back to the parent
+    return [
+        CachedSegment(
+            seg.start + start_s, seg.end + start_s, seg.text,
+            [CachedWord(w.start + start_s, w.end + start_s, w.word, w.probability) for w in seg.words]
+            if seg.words is not None else None,
+            seg.avg_logprob
+        )
+        for seg in segments
+    ]
+
+
+# ─── Stitching ──────────────────────────────────────────────
+def stitch(kept, window_segments, cut_s, next_cut_s):
+    """
+    Segments of one window that belong to it: starting in [cut_s, next_cut_s),
+    the overlap midpoints with its neighbours. A segment that repeats one the
+    previous window already kept across the cut (most of its time span shared,
+    mostly the same words) is dropped.
+    """
+    spill = [seg for seg in kept[-8:] if seg.end > cut_s]  # previous window's segments reaching past the cut
+    out = []
+    for seg in window_segments:
+        if not (cut_s <= seg.start < next_cut_s) or not seg.text.strip():
+            continue
+        if any(_duplicate(seg, prev) for prev in spill):
+            continue
+        out.append(seg)
+    return out
+
+
+def _duplicate(a, b):
+    shared = min(a.end, b.end) - max(a.start, b.start)
+    shorter = max(min(a.end - a.start, b.end - b.start), 0.01)
+    return shared / shorter >= 0.5 and max(token_match_score(a.text, b.text), token_match_score(b.text, a.text)) >= 0.5
+
+
+# ─── Parent side ────────────────────────────────────────────
+class ParallelTranscriber:
+    """
+    A process pool of `workers` models, each with cpu_threads = cores / workers.
+    The pool (and the models in it) stays up between runs until shutdown().
+    """
+
+    def __init__(self, model_path, workers, compute_type="int8", window_s=300.0, overlap_s=15.0):
+        self.model_path = model_path
+        self.workers = workers
+        self.compute_type = compute_type
+        self.window_s = window_s
+        self.overlap_s = overlap_s
+        cpu_threads = max(1, (os.cpu_count() or workers) // workers)
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),  # no fork() under Tk and worker threads
+            initializer=_init_worker,
+            initargs=(model_path, compute_type, cpu_threads)
+        )
+
+    def transcribe_file(self, audio, stop_flag=None, **options):
+        """Yield segments of a PcmFile in time order, stitched across windows."""
+        samples = audio.samples
+        source = samples.filename if isinstance(samples, np.memmap) and samples.filename else np.asarray(samples)
+        windows = split_windows(audio.duration, self.window_s, self.overlap_s)
+        futures = [self._pool.submit(_transcribe_window, source, start, end, options) for start, end in windows]
+
+        # Each window owns the span between the midpoints of its overlaps
+        cuts = [0.0] + [(windows[i + 1][0] + windows[i][1]) / 2 for i in range(len(windows) - 1)] + [float("inf")]
+        kept = []
+        try:
+            for n, future in enumerate(futures):
+                if stop_flag is not None and stop_flag.is_set():
+                    break
+                for seg in stitch(kept, future.result(), cuts[n], cuts[n + 1]):
+                    kept.append(seg)
+                    yield seg
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_parallel_transcriber(model_path, workers, compute_type="int8"):
+    """Process-wide ParallelTranscriber for these settings (replacing any other)."""
+    key = (model_path, workers, compute_type)
+    with _shared_lock:
+        current = _shared.get("engine")
+        if current is not None and (current.model_path, current.workers, current.compute_type) == key:
+            return current
+        if current is not None:
+            current.shutdown()
+        _shared["engine"] = ParallelTranscriber(model_path, workers, compute_type)
+        return _shared["engine"]
+
+
+def shutdown_parallel():
+    with _shared_lock:
+        engine = _shared.pop("engine", None)
+    if engine is not None:
+        engine.shutdown()
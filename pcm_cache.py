@@ -0,0 +1,129 @@
+# pcm_cache.py
+#
+# Decoded-audio cache: the 16 kHz mono int16 PCM ffmpeg produces for a video is
+# kept on disk as a raw .s16 file and memory-mapped on later runs, so repeat
+# syncs and ASR re-tries skip decoding the video altogether.
+
+import hashlib
+import os
+
+import numpy as np
+
+from asr_cache import evict_lru
+from audio_stream import SAMPLE_RATE, PcmStream
+
+CACHE_DIR = os.path.expanduser("~/.subtitle_sync_cache/pcm")
+
+
+class PcmFile:
+    """
+    Decoded audio already on disk. Same interface as audio_stream.PcmStream
+    (duration, block iteration, close) plus .samples, the whole int16 memmap.
+    """
+
+    def __init__(self, path, samples, block_seconds=1.0):
+        self.path = path
+        self.samples = samples
+        self.duration = len(samples) / SAMPLE_RATE
+        self._block = int(SAMPLE_RATE * block_seconds)
+
+    def __iter__(self):
+        for pos in range(0, len(self.samples), self._block):
+            yield self.samples[pos:pos + self._block]
+
+    def float32(self, start_s=0.0, end_s=None):
+        """Samples in [start_s, end_s) as the float32 [-1, 1) array Whisper takes."""
+        lo = int(start_s * SAMPLE_RATE)
+        hi = len(self.samples) if end_s is None else int(end_s * SAMPLE_RATE)
+        return self.samples[lo:hi].astype(np.float32) / 32768.0
+
+    def close(self):
+        # Drop the memmap so the file is unmapped (Windows cannot evict or delete
+        # a mapped file). Closing the mmap itself would crash any slice a caller
+        # still holds; dropping the reference unmaps once the last one is gone.
+        self.samples = np.zeros(0, np.int16)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Writer:
+    """Collects a stream's raw PCM; only a complete decode is published."""
+
+    def __init__(self, final_path, on_commit=None):
+        self.final_path = final_path
+        self.on_commit = on_commit
+        self.tmp_path = f"{final_path}.{os.getpid()}.part"
+        self._file = open(self.tmp_path, "wb")
+
+    def write(self, raw):
+        self._file.write(raw)
+
+    def commit(self):
+        self._file.close()
+        os.replace(self.tmp_path, self.final_path)
+        if self.on_commit:
+            self.on_commit()
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+class PcmCache:
+    """
+    One .s16 file per video, keyed by (absolute path, size, mtime) so an edited
+    or replaced file is decoded again. File mtime tracks last use; least
+    recently used files are deleted once the cache passes max_mb.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_mb=4096):
+        self.root = root
+        self.max_mb = max_mb
+
+    def _path(self, video_path):
+        st = os.stat(video_path)
+        ident = f"{os.path.abspath(video_path)}|{st.st_size}|{st.st_mtime_ns}"
+        return os.path.join(self.root, hashlib.blake2b(ident.encode(), digest_size=16).hexdigest() + ".s16")
+
+    def open(self, video_path):
+        """PcmFile over the cached audio for video_path, or None."""
+        path = self._path(video_path)
+        try:
+            if not os.path.getsize(path):
+                return None
+            samples = np.memmap(path, dtype=np.int16, mode="r")
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # mark as recently used
+        return PcmFile(video_path, samples)
+
+    def writer(self, video_path):
+        """Tee target for PcmStream: write(raw) per block, then commit() or abort()."""
+        os.makedirs(self.root, exist_ok=True)
+        return _Writer(self._path(video_path), on_commit=self.evict)
+
+    def load(self, video_path, ffmpeg_path="ffmpeg"):
+        """
+        PcmFile for video_path, decoding it through ffmpeg first if it is not
+        cached yet. For callers that need random access to the whole track.
+        """
+        audio = self.open(video_path)
+        if audio is not None:
+            return audio
+        with PcmStream(video_path, ffmpeg_path, tee=self.writer(video_path)) as stream:
+            blocks = list(stream)
+        # Falls back to the in-memory copy if the cache file could not be written
+        return self.open(video_path) or PcmFile(video_path, np.concatenate(blocks) if blocks else np.zeros(0, np.int16))
+
+    def evict(self):
+        evict_lru(self.root, self.max_mb, ".s16")
+
+    def clear(self):
+        evict_lru(self.root, 0, ".s16")
@@ -0,0 +1,155 @@
+# probe_sync.py
+#
+# Sparse-probe sync: most jobs are a constant offset or a framerate change, which
+# a handful of short ASR probes can measure without transcribing the whole file.
+# Probe words are matched to original cues with token_match_score, and
+# asr_time = scale * cue_time + offset is fitted robustly (Theil–Sen, then least
+# squares over the inliers).
+
+from bisect import bisect_left
+from statistics import median
+
+from alignment import asr_word_sequence
+from asr_windows import transcribe_windows
+from matching import token_match_score, token_set
+from srt_time import seconds_to_ms
+from subtitle_track import SubtitleTrack
+
+INLIER_MS = 1000  # a matched cue this far off the fitted line is a false match
+
+
+class ProbeFit:
+    """offset_ms / scale map original cue times onto the audio; see good()."""
+
+    def __init__(self, offset_ms=0, scale=1.0, residual_ms=None, inliers=0, pairs=0):
+        self.offset_ms = offset_ms
+        self.scale = scale
+        self.residual_ms = residual_ms  # median |residual| over the inliers
+        self.inliers = inliers
+        self.pairs = pairs
+
+    def good(self, tolerance_ms, min_inliers=6):
+        return (
+            self.residual_ms is not None
+            and self.inliers >= min_inliers
+            and self.inliers >= self.pairs / 2
+            and self.residual_ms <= tolerance_ms
+        )
+
+    def apply(self, track):
+        """Retimed copy of track."""
+        return track.scaled(self.scale).shifted(int(round(self.offset_ms)))
+
+    def __repr__(self):
+        return (f"ProbeFit(offset={self.offset_ms:+.0f} ms, scale={self.scale:.5f}, "
+                f"residual={self.residual_ms} ms, inliers={self.inliers}/{self.pairs})")
+
+
+def probe_windows(duration_ms, count=8, length_ms=30000, margin=0.05):
+    """count windows of length_ms spread evenly, skipping the first/last margin (intro, credits)."""
+    lo = int(duration_ms * margin)
+    hi = int(duration_ms * (1 - margin)) - length_ms
+    if hi <= lo:
+        return [(0, int(duration_ms))]
+    step = (hi - lo) / max(count - 1, 1)
+    return [(int(lo + step * n), int(lo + step * n) + length_ms) for n in range(count)]
+
+
+def match_probe_words(original, words, min_score=0.8, min_words=4, max_offset_ms=300000, slack=1):
+    """
+    (cue_start_ms, asr_start_ms) pairs for cues whose words appear together in
+    one probe. Short cues ("Yeah.", "What?") are too ambiguous and are skipped,
+    as is any cue that matches equally well in two places.
+    """
+    if not words:
+        return []
+    tokens = [w[0] for w in words]
+    first_ms, last_ms = words[0][1], words[-1][2]
+    pairs = []
+    for start, text in zip(original.starts.tolist(), original.texts):
+        if start < first_ms - max_offset_ms or start > last_ms + max_offset_ms:
+            continue
+        wanted = token_set(text)
+        if len(wanted) < min_words:
+            continue
+        span = len(text.split()) + slack
+        best, best_k, tied = 0.0, None, False
+        for k in range(len(tokens)):
+            if tokens[k] not in wanted:
+                continue
+            score = token_match_score(text, " ".join(tokens[k:k + span]))
+            if score > best:
+                best, best_k, tied = score, k, False
+            elif score == best and best_k is not None and k - best_k > span:
+                tied = True
+        if best >= min_score and not tied:
+            pairs.append((start, words[best_k][1]))
+    return pairs
+
+
+def fit_offset_scale(pairs, inlier_ms):
+    """Robust fit of asr = scale * cue + offset over (cue_ms, asr_ms) pairs."""
+    if len(pairs) < 2:
+        if pairs:
+            return ProbeFit(pairs[0][1] - pairs[0][0], 1.0, 0, 1, 1)
+        return ProbeFit()
+
+    # Theil–Sen: median of pairwise slopes is immune to a minority of bad matches
+    slopes = [
+        (a2 - a1) / (c2 - c1)
+        for i, (c1, a1) in enumerate(pairs)
+        for c2, a2 in pairs[i + 1:]
+        if abs(c2 - c1) > 1000
+    ]
+    scale = median(slopes) if slopes else 1.0
+    offset = median(a - scale * c for c, a in pairs)
+
+    inliers = [(c, a) for c, a in pairs if abs(a - (scale * c + offset)) <= inlier_ms]
+    if len(inliers) >= 2:
+        # Least-squares refinement on the inliers only
+        n = len(inliers)
+        mc = sum(c for c, _ in inliers) / n
+        ma = sum(a for _, a in inliers) / n
+        var = sum((c - mc) ** 2 for c, _ in inliers)
+        if var > 0:
+            scale = sum((c - mc) * (a - ma) for c, a in inliers) / var
+            offset = ma - scale * mc
+        inliers = [(c, a) for c, a in pairs if abs(a - (scale * c + offset)) <= inlier_ms]
+
+    residual = median(abs(a - (scale * c + offset)) for c, a in inliers) if inliers else None
+    return ProbeFit(offset, scale, residual, len(inliers), len(pairs))
+
+
+def estimate_offset_drift(model, audio, original, tolerance_ms, count=8, length_ms=30000, stop_flag=None, **transcribe_kwargs):
+    """
+    Transcribe `count` probe windows of a PcmFile and fit offset + scale of the
+    original track against them. Returns a ProbeFit; check fit.good(tolerance_ms).
+    A set stop_flag ends transcription early; the fit is then never good.
+    """
+    windows = probe_windows(int(audio.duration * 1000), count, length_ms)
+    transcribe_kwargs.setdefault("word_timestamps", True)
+    segments = []
+    for segment in transcribe_windows(model, audio, windows, **transcribe_kwargs):
+        if stop_flag is not None and stop_flag.is_set():
+            return ProbeFit()
+        segments.append(segment)
+    words = asr_word_sequence(probe_track(segments))
+    word_starts = [w[1] for w in words]
+
+    pairs = []
+    for start_ms, end_ms in windows:
+        probe = words[bisect_left(word_starts, start_ms):bisect_left(word_starts, end_ms)]
+        pairs.extend(match_probe_words(original, probe))
+    return fit_offset_scale(pairs, inlier_ms=min(tolerance_ms, INLIER_MS))
+
+
+def probe_track(segments):
+    """Word-level track when word timestamps are present, else segment-level."""
+    words = [w for seg in segments for w in (seg.words or []) if w.word.strip()]
+    if words:
+        return SubtitleTrack(
+            [seconds_to_ms(w.start) for w in words],
+            [seconds_to_ms(w.end) for w in words],
+            [w.word.strip() for w in words]
+        )
+    return SubtitleTrack.from_segments(segments)
@@ -0,0 +1,51 @@
+# srt_time.py
+#
+# SRT timestamp codec: "HH:MM:SS,mmm" ⇄ integer milliseconds.
+# Timestamps are parsed once when a file is read and carried as int ms through
+# the merge; text is only produced again when a block is written out.
+
+import re
+
+# Anything looser than the canonical 12-character form (1-digit fields,
+# '.' instead of ',', short fractions, hours past 99)
+_LOOSE = re.compile(r"\s*(\d+):(\d{1,2}):(\d{1,2})(?:[,.](\d{1,3}))?\s*$")
+
+_TWO = [f"{n:02}" for n in range(100)]
+_THREE = [f"{n:03}" for n in range(1000)]
+
+
+def srt_time_to_ms(ts):
+    """'HH:MM:SS,mmm' → integer milliseconds. Raises ValueError if malformed."""
+    if len(ts) == 12 and ts[2] == ":" and ts[5] == ":" and ts[8] in ",.":
+        try:
+            return (
+                int(ts[0:2]) * 3_600_000
+                + int(ts[3:5]) * 60_000
+                + int(ts[6:8]) * 1000
+                + int(ts[9:12])
+            )
+        except ValueError:
+            pass
+
+    match = _LOOSE.match(ts)
+    if not match:
+        raise ValueError(f"Not an SRT timestamp: {ts!r}")
+    h, m, s, frac = match.groups()
+    return (int(h) * 60 + int(m)) * 60_000 + int(s) * 1000 + int((frac or "0").ljust(3, "0"))
+
+
+def ms_to_srt_time(ms):
+    """Integer milliseconds → 'HH:MM:SS,mmm' (negative values clamp to zero)."""
+    ms = int(ms)
+    if ms <= 0:
+        return "00:00:00,000"
+    secs, millis = divmod(ms, 1000)
+    mins, secs = divmod(secs, 60)
+    hrs, mins = divmod(mins, 60)
+    hh = _TWO[hrs] if hrs < 100 else str(hrs)
+    return f"{hh}:{_TWO[mins]}:{_TWO[secs]},{_THREE[millis]}"
+
+
+def seconds_to_ms(seconds):
+    """Float seconds (as Whisper reports them) → nearest integer millisecond."""
+    return int(round(seconds * 1000))
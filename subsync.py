@@ -0,0 +1,337 @@
+# subsync.py
+#
+# Command-line front end to sync_core, for machines without a display:
+#
+#   python subsync.py asr VIDEO [-o OUT.srt]
+#   python subsync.py sync VIDEO ORIGINAL.srt [-o OUT.srt]
+#   python subsync.py sync-only ORIGINAL.srt ASR.srt [-o OUT.srt]
+#   python subsync.py batch FOLDER [--output-dir DIR]
+#   python subsync.py watch [FOLDER ...] [--settle 10] [--concurrency 1]
+#   python subsync.py serve [--port 8765] [--jobs 1] [--stub]
+#   python subsync.py jobs [--limit 20] | resume [JOB_ID]
+#
+# Flags mirror the GUI's Settings menu; run with -h for the list. Settings
+# found by autotune.py on this machine are used unless --compute-type is given.
+# Every run is recorded in the job ledger (job_ledger.py). "resume" re-runs a
+# recorded job using the PCM and ASR caches; it does not skip stages itself.
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from shutil import which
+
+from autotune import CONFIG_PATH, TUNING_KEY, tuned_runtime
+from batch_sync import format_summary, pair_episodes, run_batch
+from job_ledger import JobLedger, format_jobs
+from job_server import JobQueue, make_server
+from model_pool import MODEL_POOL
+from watch_folder import WatchDaemon
+from sync_core import (
+    DRAFT_MODEL_DIR, DRAFT_REPO_ID, WHISPER_MODEL_DIR, WHISPER_REPO_ID,
+    SyncCore, SyncSettings, output_name
+)
+
+
+def ensure_model(repo_id, model_dir):
+    """Local model directory, downloading it from the Hugging Face Hub the first time."""
+    if os.path.isdir(model_dir) and os.listdir(model_dir):
+        return model_dir
+    from huggingface_hub import snapshot_download
+    print(f"Downloading {repo_id} to {model_dir}…", file=sys.stderr)
+    return snapshot_download(repo_id=repo_id, local_dir=model_dir)
+
+
+def load_runtime(config_path=CONFIG_PATH):
+    try:
+        with open(config_path, encoding="utf-8") as f:
+            return tuned_runtime(json.load(f).get(TUNING_KEY))
+    except (OSError, ValueError):
+        return tuned_runtime(None)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="subsync", description="Synchronize subtitles to a video with Whisper ASR.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    asr = argparse.ArgumentParser(add_help=False)
+    asr.add_argument("--model", default=WHISPER_MODEL_DIR, help="CTranslate2 Whisper model directory")
+    asr.add_argument("--ffmpeg", default=which("ffmpeg") or "ffmpeg")
+    asr.add_argument("--beam-size", type=int, default=5)
+    asr.add_argument("--word-level", action=argparse.BooleanOptionalAction, default=True,
+                     help="word-level ASR timestamps (default on)")
+    asr.add_argument("--lazy-words", action="store_true", help="word timestamps only where a match needs them")
+    asr.add_argument("--workers", type=int, default=1, help="parallel ASR worker processes")
+    asr.add_argument("--batched", action="store_true", help="batched inference engine")
+    asr.add_argument("--batch-size", type=int, default=8)
+    asr.add_argument("--compute-type", help="override the tuned compute_type (int8, int8_float32, float32)")
+    asr.add_argument("--cpu-threads", type=int, help="override the tuned cpu_threads (0 = automatic)")
+    asr.add_argument("--no-cache", action="store_true", help="bypass the ASR result cache")
+
+    merge = argparse.ArgumentParser(add_help=False)
+    merge.add_argument("--threshold", type=float, default=10.0, help="match time tolerance in seconds")
+    merge.add_argument("--chunk-size", type=int, default=8)
+    merge.add_argument("--chunk-step", type=int, default=2)
+    merge.add_argument("--engine", choices=("greedy", "dp"), default="greedy", help="alignment engine")
+    merge.add_argument("--search", choices=("sparse", "index", "exhaustive", "compare"),
+                       default=SyncSettings.DEFAULTS["candidate_search"], help="candidate search")
+    merge.add_argument("--no-time-window", action="store_true", help="search all ASR chunks for every cue")
+    merge.add_argument("--no-merge-comments", action="store_true", help="match [comment] cues like dialogue")
+    merge.add_argument("--distribute-unmatched", action="store_true", help="spread unmatched cues over their gap")
+
+    sync = argparse.ArgumentParser(add_help=False)
+    sync.add_argument("--targeted", action="store_true", help="only transcribe around the original cues")
+    sync.add_argument("--probe-first", action="store_true", help="try an offset/drift fit from probes first")
+    sync.add_argument("--two-tier", action="store_true", help="small-model draft, large model where unsure")
+    sync.add_argument("--draft-model", default=DRAFT_MODEL_DIR)
+
+    out = argparse.ArgumentParser(add_help=False)
+    out.add_argument("-o", "--output", help="output .srt (default: named like the GUI's suggestion)")
+    out.add_argument("-q", "--quiet", action="store_true", help="only print errors and the result")
+
+    p = commands.add_parser("asr", parents=[asr, out], help="transcribe a video to .srt")
+    p.add_argument("video")
+    p = commands.add_parser("sync", parents=[asr, merge, sync, out], help="ASR a video and retime a subtitle to it")
+    p.add_argument("video")
+    p.add_argument("subtitle")
+    p = commands.add_parser("sync-only", parents=[merge, out], help="retime a subtitle to an existing ASR .srt")
+    p.add_argument("subtitle")
+    p.add_argument("asr_srt")
+    p = commands.add_parser("batch", parents=[asr, merge, sync], help="sync every video in a folder with its original .srt")
+    p.add_argument("folder")
+    p.add_argument("--output-dir", help="where synced .srt files go (default: next to each original)")
+    p.add_argument("--summary", help="summary table file (default: FOLDER/subsync_batch_summary.txt)")
+    p.add_argument("-q", "--quiet", action="store_true", help="only print errors and the summary")
+    p = commands.add_parser("watch", parents=[asr, merge, sync], help="sync video + .srt pairs as they land in folders")
+    p.add_argument("folders", nargs="*", help=f"folders to watch (default: watch_folders in {CONFIG_PATH})")
+    p.add_argument("--settle", type=float, default=10.0, help="seconds a file must stay unchanged before it counts as copied")
+    p.add_argument("--concurrency", type=int, default=1, help="episodes synced at the same time")
+    p.add_argument("--poll", type=float, default=5.0, help="rescan interval where inotify is unavailable")
+    p.add_argument("--no-recursive", action="store_true", help="ignore subfolders")
+    p.add_argument("--skip-existing", action="store_true", help="only sync files that arrive after startup")
+    p.add_argument("-q", "--quiet", action="store_true", help="only print arrivals, results and errors")
+    p = commands.add_parser("serve", parents=[asr, merge, sync], help="local HTTP/JSON job API (flags are the job defaults)")
+    p.add_argument("--host", default="127.0.0.1", help="address to bind (default: loopback only)")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--jobs", type=int, default=1, help="jobs run at the same time")
+    p.add_argument("--stub", action="store_true", help="no model: each job's subtitle, shifted, stands in for the ASR")
+    p.add_argument("--stub-offset", type=float, default=2.5, help="seconds the --stub transcript is shifted by")
+    p.add_argument("--output-root", help="jobs may also write outputs under this folder (default: only beside their video)")
+    p.add_argument("-q", "--quiet", action="store_true", help="no per-request log lines")
+    p = commands.add_parser("jobs", help="recent jobs from the ledger, with stage timings")
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--state", choices=("running", "done", "failed", "interrupted"))
+    p = commands.add_parser("resume", help="rerun an interrupted job from the start; stages it completed come back from the caches if still there")
+    p.add_argument("job_id", nargs="?", type=int, help="ledger job id (default: the most recent interrupted job)")
+    p.add_argument("--model", default=WHISPER_MODEL_DIR, help="CTranslate2 Whisper model directory")
+    p.add_argument("--draft-model", default=DRAFT_MODEL_DIR)
+    p.add_argument("--ffmpeg", default=which("ffmpeg") or "ffmpeg")
+    p.add_argument("-q", "--quiet", action="store_true", help="only print errors and the result")
+    return parser
+
+
+def settings_from(args):
+    values = {}
+    if hasattr(args, "beam_size"):
+        runtime = load_runtime()
+        if args.compute_type:
+            runtime["compute_type"] = args.compute_type
+        if args.cpu_threads is not None:
+            runtime["cpu_threads"] = args.cpu_threads
+        values.update(
+            beam_size=args.beam_size,
+            word_level_asr=args.word_level,
+            lazy_word_timestamps=args.lazy_words,
+            asr_workers=args.workers,
+            batched_asr=args.batched,
+            batch_size=args.batch_size,
+            bypass_asr_cache=args.no_cache,
+            runtime=runtime
+        )
+    if hasattr(args, "threshold"):
+        values.update(
+            match_threshold=args.threshold,
+            chunk_size=args.chunk_size,
+            chunk_step=args.chunk_step,
+            alignment_engine=args.engine,
+            candidate_search=args.search,
+            use_time_window=not args.no_time_window,
+            merge_comments=not args.no_merge_comments,
+            distribute_unmatched=args.distribute_unmatched
+        )
+    if hasattr(args, "two_tier"):
+        values.update(targeted_asr=args.targeted, probe_first=args.probe_first, two_tier_asr=args.two_tier)
+    return SyncSettings(**values)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    ledger = JobLedger(log=lambda text: print(text, file=sys.stderr, flush=True))
+    if args.command == "jobs":
+        print(format_jobs(ledger.jobs(args.limit, args.state)), end="")
+        return 0
+    settings = settings_from(args)
+    stop_flag = threading.Event()
+    log = (lambda text: None) if args.quiet else (lambda text: print(text, file=sys.stderr, flush=True))
+
+    model_path = draft_path = None
+    if args.command not in ("sync-only", "resume") and not getattr(args, "stub", False):
+        model_path = ensure_model(WHISPER_REPO_ID, args.model) if args.model == WHISPER_MODEL_DIR else args.model
+        if getattr(args, "two_tier", False):
+            draft_path = ensure_model(DRAFT_REPO_ID, args.draft_model) if args.draft_model == DRAFT_MODEL_DIR else args.draft_model
+    core = SyncCore(settings, model_path, getattr(args, "ffmpeg", "ffmpeg"), draft_path, stop_flag=stop_flag, log=log, ledger=ledger)
+
+    if args.command == "batch":
+        return batch(core, args)
+    if args.command == "watch":
+        return watch(args, lambda: SyncCore(settings, model_path, args.ffmpeg, draft_path, log=log, ledger=ledger))
+    if args.command == "serve":
+        return serve(args, settings, model_path, draft_path, ledger)
+    if args.command == "resume":
+        return resume(core, args, ledger)
+
+    started = time.time()
+    try:
+        if args.command == "asr":
+            output = args.output or output_name(args.video, None, settings.beam_size, settings.word_level_asr)
+            segments = core.asr(args.video, output)
+            summary = f"{sum(1 for seg in segments if seg.text.strip())} segments"
+        elif args.command == "sync":
+            output = args.output or output_name(None, args.subtitle)
+            result = core.sync(args.video, args.subtitle, output)
+            summary = (f"synced from probes: offset {result.fit.offset_ms / 1000:+.2f} s, scale {result.fit.scale:.4f}"
+                       if result.method == "probe" else f"{result.matched}/{len(result.track)} lines retimed")
+        else:
+            output = args.output or output_name(None, args.subtitle)
+            result = core.sync_only(args.subtitle, args.asr_srt, output)
+            summary = f"{result.matched}/{len(result.track)} lines retimed"
+    except KeyboardInterrupt:
+        stop_flag.set()
+        print("Interrupted.", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"subsync {args.command} failed: {type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+
+    if stop_flag.is_set():
+        print("Transcription was interrupted; output is partial.", file=sys.stderr)
+    print(f"{output}: {summary} in {time.time() - started:.1f} s")
+    return 0
+
+
+def batch(core, args):
+    pairs = pair_episodes(args.folder)
+    if not pairs:
+        print(f"No video/subtitle pairs found in {args.folder}", file=sys.stderr)
+        return 1
+    print(f"{len(pairs)} episodes:", file=sys.stderr)
+    for video, subtitle in pairs:
+        print(f"  {os.path.basename(video)}  <-  {os.path.basename(subtitle)}", file=sys.stderr)
+
+    def output_for(video, subtitle):
+        name = output_name(None, subtitle)
+        return os.path.join(args.output_dir, os.path.basename(name)) if args.output_dir else name
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    try:
+        reports = run_batch(core, pairs, output_for)
+    except KeyboardInterrupt:
+        core.stop_flag.set()
+        print("Interrupted.", file=sys.stderr)
+        return 130
+
+    summary = format_summary(reports)
+    print(summary)
+    summary_path = args.summary or os.path.join(args.folder, "subsync_batch_summary.txt")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        f.write(summary)
+    return 1 if any(r.error for r in reports) else 0
+
+
+def watch(args, core_factory):
+    folders = args.folders
+    if not folders:
+        try:
+            with open(CONFIG_PATH, encoding="utf-8") as f:
+                folders = json.load(f).get("watch_folders") or []
+        except (OSError, ValueError):
+            folders = []
+    if not folders:
+        print(f"No folders to watch; pass them or set watch_folders in {CONFIG_PATH}", file=sys.stderr)
+        return 1
+
+    daemon = WatchDaemon(
+        core_factory, folders, settle_s=args.settle, concurrency=args.concurrency,
+        recursive=not args.no_recursive, poll_s=args.poll, skip_existing=args.skip_existing,
+        log=lambda text: print(text, file=sys.stderr, flush=True)
+    )
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        print("Stopped.", file=sys.stderr)
+    return 0
+
+
+def resume(core, args, ledger):
+    if args.job_id is None:
+        jobs = ledger.resumable()
+        if not jobs:
+            print("No interrupted jobs to resume.", file=sys.stderr)
+            return 1
+        job = jobs[0]
+    else:
+        job = ledger.job(args.job_id)
+        if job is None:
+            print(f"No job {args.job_id} in the ledger", file=sys.stderr)
+            return 1
+    if job["kind"] != "sync-only":
+        core.model_path = ensure_model(WHISPER_REPO_ID, args.model) if args.model == WHISPER_MODEL_DIR else args.model
+    if job["kind"] == "sync" and job["settings"].get("two_tier_asr"):
+        core.draft_model_path = ensure_model(DRAFT_REPO_ID, args.draft_model) if args.draft_model == DRAFT_MODEL_DIR else args.draft_model
+
+    started = time.time()
+    try:
+        result = core.resume(job["id"])
+    except KeyboardInterrupt:
+        core.stop_flag.set()
+        print("Interrupted.", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"subsync resume failed: {type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+    if job["kind"] == "asr":
+        summary = f"{sum(1 for seg in result if seg.text.strip())} segments"
+    elif result.method == "probe":
+        summary = "synced from probes"
+    else:
+        summary = f"{result.matched}/{len(result.track)} lines retimed"
+    print(f"Job {job['id']}: {job['output']}: {summary} in {time.time() - started:.1f} s")
+    return 0
+
+
+def serve(args, settings, model_path, draft_path, ledger=None):
+    if model_path:
+        MODEL_POOL.idle_timeout = 0  # requests may be hours apart; keep the model warm
+        MODEL_POOL.prewarm(model_path, **(settings.runtime or {}))
+    jobs = JobQueue(
+        model_path, args.ffmpeg, draft_path, defaults=settings.as_dict(), workers=args.jobs,
+        stub=args.stub, stub_offset_ms=int(round(args.stub_offset * 1000)), ledger=ledger,
+        output_root=args.output_root,
+        log=lambda text: None if args.quiet and text.startswith("[HTTP]") else print(text, file=sys.stderr, flush=True)
+    )
+    server = make_server(jobs, args.host, args.port)
+    print(f"Serving jobs on http://{args.host}:{server.server_port}/jobs" + (" (stub ASR)" if args.stub else ""), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopped.", file=sys.stderr)
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
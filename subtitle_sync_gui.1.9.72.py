@@ -4,13 +4,25 @@ import os
 import sys
 import time
 import wave
-import tempfile
 import threading
+import multiprocessing
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog, ttk
-import ffmpeg  # type: ignore
-from faster_whisper import WhisperModel  # type: ignore
 from theme import RIBBON_BUTTON_STYLE
+from matching import token_match_score
+from srt_time import ms_to_srt_time, seconds_to_ms, srt_time_to_ms
+from subtitle_track import SubtitleTrack
+from model_pool import MODEL_POOL
+from asr_cache import AsrCache
+from pcm_cache import PcmCache
+from job_ledger import JobLedger, format_jobs
+from vad_sync import COMMON_SCALES, vad_sync
+from autotune import TUNING_KEY, best_record, tune, tuned_runtime
+from autotune import excerpt as tuning_excerpt, format_result as format_tuning, grid as tuning_grid
+from sync_core import (
+    DRAFT_MODEL_DIR, DRAFT_REPO_ID, WHISPER_MODEL_DIR, WHISPER_REPO_ID, SyncCore, SyncSettings, output_name
+)
+from parallel_asr import shutdown_parallel
 import logging
 import io
 import contextlib
@@ -22,6 +34,7 @@ import os, json
 # run_sync
 
 CONFIG_PATH = os.path.expanduser("~/.subtitle_sync_config.json")
+VAD_MIN_CONFIDENCE = 0.25  # below this a VAD-only sync is a guess; use Whisper
 logging.basicConfig(level=logging.DEBUG)
 
 from huggingface_hub import snapshot_download
@@ -256,15 +269,28 @@ class SubtitleSyncApp:
         self.export_filename = tk.StringVar(value="—")
         self.flush_lines     = tk.IntVar(value=10)
         self.beam_size       = tk.IntVar(value=5)
+        self.batch_size      = tk.IntVar(value=8)
+        self.batched_asr     = tk.BooleanVar(value=False)
         self.match_threshold = tk.DoubleVar(value=10.0)
 
         self.preview_buffer   = []
         self.whisper_buffer   = []
         self.word_level_asr   = tk.BooleanVar(value=True)
+        self.lazy_word_timestamps = tk.BooleanVar(value=False)
         self.stop_flag        = threading.Event()
+        self.running          = False  # a run is in progress; Stop applies to it
         self.auto_scroll_right= True
         self.chunk_size       = tk.IntVar(value=8)
         self.chunk_step       = tk.IntVar(value=2)
+        self.merge_comments   = tk.BooleanVar(value=True)
+        self.candidate_search = tk.StringVar(value="sparse")  # sparse | index | exhaustive | compare
+        self.use_time_window  = tk.BooleanVar(value=True)
+        self.alignment_engine = tk.StringVar(value="greedy")  # greedy | dp
+        self.distribute_unmatched = tk.BooleanVar(value=False)
+        self.targeted_asr     = tk.BooleanVar(value=False)
+        self.probe_first      = tk.BooleanVar(value=False)
+        self.two_tier_asr     = tk.BooleanVar(value=False)
+        self.vad_try_scales   = tk.BooleanVar(value=True)
 
         # Update beam display when beam_size changes
         self.beam_size.trace_add("write", lambda *args: self.update_beam_status())
@@ -278,6 +304,19 @@ class SubtitleSyncApp:
         if cfg.get("output_path"):
             self.output_path.set(cfg["output_path"])
 
+        # Loaded Whisper models stay warm between runs (see model_pool.py)
+        self.model_idle_minutes = tk.IntVar(value=cfg.get("model_idle_minutes", 15))
+        self.model_memory_mb    = tk.IntVar(value=cfg.get("model_memory_mb", 0))
+        self.apply_model_pool_settings()
+
+        # Finished transcriptions are reused when the same video is run again
+        self.asr_cache        = AsrCache(max_mb=cfg.get("asr_cache_mb", 500))
+        self.bypass_asr_cache = tk.BooleanVar(value=False)
+        self.pcm_cache        = PcmCache(max_mb=cfg.get("pcm_cache_mb", 4096))
+        # Every run is recorded with its stage timings; an interrupted one can be re-run (disabled if unwritable)
+        self.job_ledger       = JobLedger(log=lambda text: self.debug("{}", text))
+        self.asr_workers      = tk.IntVar(value=cfg.get("asr_workers", 1))  # >1 = parallel chunked ASR
+
         # ─── Load icons (your existing dictionary) ──────────────
         self.icons = {
             # … your icon setup here …
@@ -295,10 +334,16 @@ class SubtitleSyncApp:
         # Reflect loaded paths in status bar
         self.update_status_bar()
         self.debug("[INFO] READY - all logs will be recorded here.")
+
+        # Load the model in the background so the first run starts warm
+        if os.path.isdir(WHISPER_MODEL_DIR):
+            MODEL_POOL.prewarm(WHISPER_MODEL_DIR, **self.asr_runtime())
+            self.debug("[INFO] Prewarming Whisper model from {}", WHISPER_MODEL_DIR)
   
       
     def on_close(self):
         self.stop_flag.set()        
+        shutdown_parallel()
         self.root.destroy()
 
     def create_menu_bar(self):
@@ -329,6 +374,32 @@ class SubtitleSyncApp:
                 value=val
             )
         settings_menu.add_cascade(label="Beam Size", menu=beam_menu)
+
+        batch_menu = tk.Menu(settings_menu, tearoff=0)
+        batch_menu.add_checkbutton(
+            label="Use batched inference engine",
+            variable=self.batched_asr,
+            onvalue=True,
+            offvalue=False
+        )
+        batch_menu.add_separator()
+        for val in (4, 8, 16, 32):
+            batch_menu.add_radiobutton(
+                label=f"{val}",
+                variable=self.batch_size,
+                value=val
+            )
+        settings_menu.add_cascade(label="Batch Size", menu=batch_menu)
+
+        workers_menu = tk.Menu(settings_menu, tearoff=0)
+        for val in (1, 2, 4, 8, 16):
+            workers_menu.add_radiobutton(
+                label="Off (single process)" if val == 1 else f"{val} worker processes",
+                variable=self.asr_workers,
+                value=val,
+                command=lambda: save_config({**load_config(), "asr_workers": self.asr_workers.get()})
+            )
+        settings_menu.add_cascade(label="Parallel ASR", menu=workers_menu)
         menu_bar.add_cascade(label="Settings", menu=settings_menu)
         settings_menu.add_checkbutton(
             label="Merge [comments] into ASR blocks",
@@ -357,6 +428,92 @@ class SubtitleSyncApp:
             offvalue=False
         )
 
+        settings_menu.add_checkbutton(
+            label="Word Timestamps Only Where Needed (lazy)",
+            variable=self.lazy_word_timestamps,
+            onvalue=True,
+            offvalue=False
+        )
+
+        search_menu = tk.Menu(settings_menu, tearoff=0)
+        search_menu.add_radiobutton(
+            label="Sparse matrix (NumPy)",
+            variable=self.candidate_search,
+            value="sparse"
+        )
+        for label, value in [
+            ("Token index", "index"),
+            ("Exhaustive scan", "exhaustive"),
+            ("Compare fast scorers vs. exhaustive (debug)", "compare"),
+        ]:
+            search_menu.add_radiobutton(label=label, variable=self.candidate_search, value=value)
+        search_menu.add_separator()
+        search_menu.add_checkbutton(
+            label="Limit search to Sync Tolerance window",
+            variable=self.use_time_window,
+            onvalue=True,
+            offvalue=False
+        )
+        settings_menu.add_cascade(label="Candidate Search", menu=search_menu)
+
+        engine_menu = tk.Menu(settings_menu, tearoff=0)
+        engine_menu.add_radiobutton(label="Greedy best chunk", variable=self.alignment_engine, value="greedy")
+        engine_menu.add_radiobutton(label="Monotonic DP (keeps cue order)", variable=self.alignment_engine, value="dp")
+        settings_menu.add_cascade(label="Alignment Engine", menu=engine_menu)
+        settings_menu.add_checkbutton(
+            label="Spread unmatched runs proportionally across gaps",
+            variable=self.distribute_unmatched,
+            onvalue=True,
+            offvalue=False
+        )
+
+        pool_menu = tk.Menu(settings_menu, tearoff=0)
+        pool_menu.add_command(label="Set Idle Unload Time...", command=self.prompt_model_idle)
+        pool_menu.add_command(label="Set Memory Budget...", command=self.prompt_model_memory)
+        pool_menu.add_command(label="Unload Models Now", command=self.unload_models)
+        settings_menu.add_cascade(label="Model Cache", menu=pool_menu)
+        settings_menu.add_checkbutton(
+            label="Probe for offset/drift before full ASR",
+            variable=self.probe_first,
+            onvalue=True,
+            offvalue=False
+        )
+        settings_menu.add_checkbutton(
+            label="VAD Sync: also try framerate changes",
+            variable=self.vad_try_scales,
+            onvalue=True,
+            offvalue=False
+        )
+        settings_menu.add_checkbutton(
+            label="Targeted ASR (only transcribe around original cues)",
+            variable=self.targeted_asr,
+            onvalue=True,
+            offvalue=False
+        )
+        settings_menu.add_checkbutton(
+            label="Two-Tier ASR (small model first, large-v3 where unsure)",
+            variable=self.two_tier_asr,
+            onvalue=True,
+            offvalue=False
+        )
+        settings_menu.add_checkbutton(
+            label="Bypass ASR result cache",
+            variable=self.bypass_asr_cache,
+            onvalue=True,
+            offvalue=False
+        )
+
+        pref_menu = tk.Menu(menu_bar, tearoff=0)
+        pref_menu.add_command(label="Clear Saved Paths", command=self.clear_saved_paths)
+        pref_menu.add_command(label="Clear ASR Result Cache", command=self.clear_asr_cache)
+        pref_menu.add_command(label="Clear Decoded Audio Cache", command=self.clear_pcm_cache)
+        pref_menu.add_separator()
+        pref_menu.add_command(label="Tune ASR Performance...", command=self.start_tuning)
+        pref_menu.add_command(label="Reset ASR Tuning", command=self.reset_tuning)
+        pref_menu.add_separator()
+        pref_menu.add_command(label="Job History...", command=self.show_job_history)
+        pref_menu.add_command(label="Resume Interrupted Job", command=self.start_resume)
+        menu_bar.add_cascade(label="Preferences", menu=pref_menu)
 
         # Help menu
         help_menu = tk.Menu(menu_bar, tearoff=0)
@@ -398,6 +555,7 @@ class SubtitleSyncApp:
             ("ASR (Whisper Only)", self.start_asr_only, "asr_only"),
             ("Full ASR and Sync", self.start_process, "syncred"),
             ("Sync Only", self.sync_only_mode, "syncred"),  # 👈 both start red by default                       
+            ("VAD Sync", self.start_vad_sync, "vad_sync"),
             ("Stop", self.trigger_stop, "stop"), 
             ("Live Scroll", self.enable_auto_scroll, "live_scroll"),          
             ("Reset", self.reset_app, "reset"),
@@ -418,6 +576,9 @@ class SubtitleSyncApp:
             if label == "ASR (Whisper Only)":
                 ToolTip(btn, "Run Whisper transcription only — no syncing")
 
+            if label == "VAD Sync":
+                ToolTip(btn, "Align to speech activity in the audio — no Whisper, seconds on CPU")
+
             if label == "Stop":
                 self.btn_stop = btn
                 self.btn_stop.config(state="disabled")  # Start disabled
@@ -432,6 +593,13 @@ class SubtitleSyncApp:
     def start_asr_only(self):
         threading.Thread(target=self.run_asr_only).start()                                  
 
+    def start_vad_sync(self):
+        if not self.video_path.get() or not self.subtitle_path.get() or not self.output_path.get():
+            messagebox.showwarning("Missing Files", "Please select a video, an original subtitle and an export file.")
+            return
+        threading.Thread(target=self.run_vad_sync, daemon=True).start()
+        self.feedback_label.config(text="🟢 VAD sync started...")
+
     def create_feedback_panel(self):
         self.feedback_frame = tk.Frame(self.root, bg="#f8f8f8", bd=1, relief="sunken")
         self.feedback_frame.grid(row=99, column=0, columnspan=3, sticky="we")
@@ -914,33 +1082,19 @@ class SubtitleSyncApp:
             self.debug("[INFO] run_asr_only() starting…")
 
             # 1) Ensure model & ffmpeg
-            repo_id, model_dir = "openai/whisper-large-v3", "models/whisper-large-v3"
-            model_path = ModelDownloader.ensure_model(repo_id, model_dir)
+            model_path = ModelDownloader.ensure_model(WHISPER_REPO_ID, WHISPER_MODEL_DIR)
             self.debug("[INFO] Whisper model at {}", model_path)
 
             ffmpeg_path = find_ffmpeg()
             self.debug("[INFO] Using ffmpeg at {}", ffmpeg_path)
 
-            # 2) Extract audio
-            self.status_label.config(text="🎙️ Extracting audio…")
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                wav_path = tmp.name
-            ffmpeg.input(self.video_path.get()) \
-                .output(wav_path, format="wav", acodec="pcm_s16le", ac=1, ar="16000") \
-                .run(cmd=ffmpeg_path, overwrite_output=True)
-
-            # 3) Transcribe streaming into UI
-            self.attach_whisper_logger()
-            model = WhisperModel(model_path, compute_type="int8")
-            segments = self.capture_transcribe_output(model, wav_path)
-            self.detach_whisper_logger()
-
-            # 4) Write out .srt
+            # 2-4) Reuse a cached transcription, or decode and transcribe; write the .srt
             out_path = self.output_path.get()
-            with open(out_path, "w", encoding="utf-8", newline="\r\n") as f:
-                for i, seg in enumerate(segments, start=1):
-                    s, e = self.format_timestamp(seg.start), self.format_timestamp(seg.end)
-                    f.write(f"{i}\r\n{s} --> {e}\r\n{seg.text.strip()}\r\n\r\n")
+            self.attach_whisper_logger()
+            try:
+                self.sync_core(model_path, ffmpeg_path).asr(self.video_path.get(), out_path)
+            finally:
+                self.detach_whisper_logger()
 
             # Done
             self.feedback_label.config(text=f"✅ ASR-only complete → {os.path.basename(out_path)}")
@@ -968,47 +1122,32 @@ class SubtitleSyncApp:
             self.debug("[INFO] run_sync() starting…")
 
             # 1) Ensure model & ffmpeg
-            repo_id, model_dir = "openai/whisper-large-v3", "models/whisper-large-v3"
-            model_path = ModelDownloader.ensure_model(repo_id, model_dir)
+            model_path = ModelDownloader.ensure_model(WHISPER_REPO_ID, WHISPER_MODEL_DIR)
             self.debug("[INFO] Whisper model at {}", model_path)
 
             ffmpeg_path = find_ffmpeg()
             self.debug("[INFO] Using ffmpeg at {}", ffmpeg_path)
 
-            # 2) Extract audio
-            self.status_label.config(text="🔁 Extracting audio…")
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                wav_path = tmp.name
-            ffmpeg.input(self.video_path.get()) \
-                .output(wav_path, format="wav", acodec="pcm_s16le", ac=1, ar="16000") \
-                .run(cmd=ffmpeg_path, overwrite_output=True)
+            draft_path = ModelDownloader.ensure_model(DRAFT_REPO_ID, DRAFT_MODEL_DIR) if self.two_tier_asr.get() else None
 
-            # 3) Transcribe streaming into UI
+            # 2-4) Probe / ASR / merge, written to the export path
+            core = self.sync_core(model_path, ffmpeg_path, draft_path)
             self.attach_whisper_logger()
-            model = WhisperModel(model_path, compute_type="int8")
-            segments = self.capture_transcribe_output(model, wav_path)
-            self.detach_whisper_logger()
-
-            # 4) Write temporary ASR .srt
-            temp_asr = tempfile.NamedTemporaryFile(suffix=".srt", delete=False, mode="w", encoding="utf-8", newline="\r\n")
-            for idx, seg in enumerate(segments, start=1):
-                s, e = self.format_timestamp(seg.start), self.format_timestamp(seg.end)
-                temp_asr.write(f"{idx}\r\n{s} --> {e}\r\n{seg.text.strip()}\r\n\r\n")
-            temp_asr.close()
-
-            # 5) Merge with original
-            self.status_label.config(text="🔗 Synchronizing subtitles…")
-            with open(self.subtitle_path.get(), encoding="utf-8") as orig_f:
-                orig_lines = orig_f.readlines()
-            with open(temp_asr.name, encoding="utf-8") as asr_f:
-                asr_lines = asr_f.readlines()
+            try:
+                result = core.sync(self.video_path.get(), self.subtitle_path.get(), self.output_path.get())
+            finally:
+                self.detach_whisper_logger()
 
-            merged = self.merge_subtitles(orig_lines, asr_lines)
-            with open(self.output_path.get(), "w", encoding="utf-8", newline="\r\n") as out:
-                out.writelines(merged)
+            if result.method == "probe":
+                self.feedback_label.config(
+                    text=f"✅ Sync complete from probes: offset {result.fit.offset_ms / 1000:+.2f} s, scale {result.fit.scale:.4f}"
+                )
+                self.status_label.config(text="✔ Sync complete", fg="#2e7d32")
+                self.progress["value"] = 100
+                return
 
             # Done
-            self.feedback_label.config(text="✅ Full sync complete.")
+            self.feedback_label.config(text=f"✅ Full sync complete: {result.matched}/{len(result.track)} lines retimed.")
             self.status_label.config(text="✔ Sync complete", fg="#2e7d32")
             self.progress["value"] = 100
             self.debug("[INFO] run_sync() finished successfully")
@@ -1022,6 +1161,54 @@ class SubtitleSyncApp:
             self.set_stop_enabled(False)
 
             
+    def run_vad_sync(self):
+        """
+        No-ASR sync: cross-correlate speech activity with the original cue
+        timings to find the offset (and framerate scale), then write it out
+        """
+        self.set_stop_enabled(True)
+
+        try:
+            self.debug("[INFO] run_vad_sync() starting…")
+            self.stop_flag.clear()
+            ffmpeg_path = find_ffmpeg()
+
+            self.status_label.config(text="🔈 Decoding audio…")
+            with open(self.subtitle_path.get(), encoding="utf-8") as orig_f:
+                original = self.parse_srt_blocks(orig_f.readlines())
+            with self.pcm_cache.load(self.video_path.get(), ffmpeg_path) as audio:
+                if self.stop_flag.is_set():
+                    self.feedback_label.config(text="🛑 VAD sync stopped — nothing written")
+                    return
+                self.status_label.config(text="📈 Correlating speech activity…")
+                scales = COMMON_SCALES if self.vad_try_scales.get() else (1.0,)
+                fit = vad_sync(audio.samples, original, scales=scales, skip_comments=self.merge_comments.get())
+            self.debug("[INFO] VAD fit: {}", fit)
+            if self.stop_flag.is_set():
+                self.feedback_label.config(text="🛑 VAD sync stopped — nothing written")
+                return
+
+            out_path = self.output_path.get()
+            fit.apply(original).write(out_path)
+
+            summary = f"offset {fit.offset_ms / 1000:+.2f} s, scale {fit.scale:.4f}, confidence {fit.confidence:.2f}"
+            if fit.confidence < VAD_MIN_CONFIDENCE:
+                self.feedback_label.config(text=f"⚠️ VAD sync uncertain ({summary}) — try Full ASR and Sync")
+                self.status_label.config(text="⚠ Low confidence", fg="#e65100")
+            else:
+                self.feedback_label.config(text=f"✅ VAD sync complete → {os.path.basename(out_path)} ({summary})")
+                self.status_label.config(text="✔ Sync complete", fg="#2e7d32")
+            self.progress["value"] = 100
+            self.debug("[INFO] run_vad_sync() finished")
+
+        except Exception:
+            tb = traceback.format_exc()
+            self.debug("[ERROR] run_vad_sync() crashed:\n{}", tb)
+            self.feedback_label.config(text="❌ VAD sync failed — see log")
+
+        finally:
+            self.set_stop_enabled(False)
+
     def debug(self, msg, *args):
         formatted = msg.format(*args)
         print(formatted, flush=True)
@@ -1036,18 +1223,9 @@ class SubtitleSyncApp:
         self.root.update_idletasks()
 
         try:
-            with open(original_path, encoding="utf-8") as orig_file:
-                original_lines = orig_file.readlines()
-            with open(asr_path, encoding="utf-8") as asr_file:
-                asr_lines = asr_file.readlines()
-
-            # ✨ TODO: Replace this with actual sync logic (e.g. match timestamps, align text, etc.)
-            synced_lines = self.merge_subtitles(original_lines, asr_lines)
+            result = self.sync_core().sync_only(original_path, asr_path, output_path)
 
-            with open(output_path, "w", encoding="utf-8") as out_file:
-                out_file.writelines(synced_lines)
-
-            self.feedback_label.config(text="✅ Sync-only completed successfully.")
+            self.feedback_label.config(text=f"✅ Sync-only completed: {result.matched}/{len(result.track)} lines retimed.")
             self.status_label.config(text="✔ Sync complete.", fg="#2e7d32", font=("Segoe UI", 9, "bold"))
             self.progress["value"] = 100
             self.flash_status_success()
@@ -1072,112 +1250,13 @@ class SubtitleSyncApp:
             self.status_label.config(text="⚠ Error during sync", fg="red")
             self.progress["value"] = 0  
 
-    def merge_subtitles(self, original_lines, asr_lines):
-        from datetime import datetime
-
-        original_blocks = self.parse_srt_blocks(original_lines)
-        asr_blocks = self.parse_srt_blocks(asr_lines)
-        chunks = self.chunk_asr_blocks(asr_blocks, self.chunk_size.get(), self.chunk_step.get())
-        threshold = self.match_threshold.get()
-        confidence_threshold = 0.5  # 🔧 Adjustable later
-
-        result = []
-        index = 1
-        matched_map = set()  # zero-based indexes of original_blocks that were matched
-
-        for i, orig in enumerate(original_blocks):
-            orig_text = orig["text"].strip()
-            if not orig_text:
-                continue
-
-            # Preserve comments unmodified
-            if orig_text.startswith("[") and orig_text.endswith("]") and self.merge_comments.get():
-                result.extend([
-                    f"{index}",
-                    f"{orig['start']} --> {orig['end']}",
-                    orig_text,
-                    ""
-                ])
-                index += 1
-                continue
-
-            best_chunk = None
-            best_score = 0.0
-
-            for chunk in chunks:
-                score = self.token_match_score(orig_text, chunk["text"])
-                if score > best_score and score >= confidence_threshold:
-                    best_score = score
-                    best_chunk = chunk
-
-            if best_chunk:
-                result.append({
-                    "index": index,
-                    "start": best_chunk["start"],
-                    "end": best_chunk["end"],
-                    "text": orig_text
-                })
-                matched_map.add(i)
-            else:
-                # Temporarily store with original timing, to be adjusted
-                result.append({
-                    "index": index,
-                    "start": orig["start"],
-                    "end": orig["end"],
-                    "text": orig_text
-                })
-
-            index += 1
-
-        # 🔁 Adjust unmatched blocks based on neighbors
-        adjusted_blocks = self.adjust_unmatched_timing(result, matched_map)
-
-        # 🔄 Format as final SRT-ready lines
-        srt_lines = []
-        for block in adjusted_blocks:
-            srt_lines.extend([
-                str(block["index"]),
-                f"{block['start']} --> {block['end']}",
-                block["text"],
-                ""
-            ])
-
-        self.feedback_label.config(
-            text=f"🔗 Realignment complete: {len(matched_map)}/{len(original_blocks)} lines retimed"
-        )
-        return [line + "\n" for line in srt_lines]
-    
     def parse_srt_blocks(self, lines):
-        blocks = []
-        block = {"index": "", "start": "", "end": "", "text": ""}
-        state = 0
-
-        for line in lines:
-            stripped = line.strip()
-            if not stripped:
-                if block["text"]:
-                    blocks.append(block)
-                    block = {"index": "", "start": "", "end": "", "text": ""}
-                state = 0
-            elif state == 0:
-                block["index"] = stripped
-                state = 1
-            elif state == 1:
-                try:
-                    block["start"], block["end"] = [t.strip() for t in stripped.split("-->")]
-                    state = 2
-                except:
-                    continue
-            else:
-                block["text"] += stripped + " "
+        # Returns a SubtitleTrack; timestamps are decoded to int ms here, once
+        return SubtitleTrack.from_lines(lines)
 
-        if block["text"]:
-            blocks.append(block)
-
-        return blocks                    
 
     def trigger_stop(self):
-        if not self.status_label.cget("text").lower().startswith(("transcribing", "running", "synchronizing", "syncing")):
+        if not self.running:
             self.feedback_label.config(text="⚠️ Nothing is currently running.")
             return
 
@@ -1207,11 +1286,7 @@ class SubtitleSyncApp:
             self.start_button.config(bg=self.root.cget("bg"))
 
     def format_timestamp(self, seconds):
-        hrs = int(seconds // 3600)
-        mins = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millis = int((seconds - int(seconds)) * 1000)
-        return f"{hrs:02}:{mins:02}:{secs:02},{millis:03}"
+        return ms_to_srt_time(seconds_to_ms(seconds))
 
     def get_audio_duration(self, path):
         with wave.open(path, "rb") as wf:
@@ -1231,33 +1306,9 @@ class SubtitleSyncApp:
             return None   
         
     def token_match_score(self, original, candidate):
-        def clean_token(token):
-            # Remove punctuation but preserve contractions (e.g., "don't")
-            return re.sub(r"[^\w']+", "", token).lower()
-
-        if not original or not candidate:
-            return 0.0
-
-        a_words = set(clean_token(w) for w in original.split() if w.strip())
-        b_words = set(clean_token(w) for w in candidate.split() if w.strip())
-
-        shared = a_words & b_words
-        return len(shared) / max(len(a_words), 1)
+        return token_match_score(original, candidate)
 
  
-    def chunk_asr_blocks(self, asr_blocks, chunk_size=8, step=2):
-        chunks = []
-        for block in asr_blocks:
-            words = block["text"].split()
-            for i in range(0, len(words) - chunk_size + 1, step):
-                chunk = " ".join(words[i:i + chunk_size])
-                chunks.append({
-                    "text": chunk,
-                    "start": block["start"],
-                    "end": block["end"]
-                })
-        return chunks    
-    
     def prompt_chunk_size(self):
         value = simpledialog.askinteger(
             "Set Chunk Size",
@@ -1277,10 +1328,149 @@ class SubtitleSyncApp:
         )
         if value:
                 self.chunk_step.set(value)    
+
+    def apply_model_pool_settings(self):
+        MODEL_POOL.idle_timeout = self.model_idle_minutes.get() * 60
+        MODEL_POOL.memory_budget_mb = self.model_memory_mb.get()
+
+    def prompt_model_idle(self):
+        value = simpledialog.askinteger(
+            "Set Idle Unload Time",
+            f"Current value: {self.model_idle_minutes.get()} min\n\nUnload a cached model after this many idle minutes (0 = never):",
+            initialvalue=self.model_idle_minutes.get(),
+            minvalue=0, maxvalue=24 * 60
+        )
+        if value is not None:
+            self.model_idle_minutes.set(value)
+            self.apply_model_pool_settings()
+            save_config({**load_config(), "model_idle_minutes": value})
+            self.feedback_label.config(text=f"⚙️ Idle models unload after {value} min" if value else "⚙️ Cached models stay loaded")
+
+    def prompt_model_memory(self):
+        value = simpledialog.askinteger(
+            "Set Memory Budget",
+            f"Current value: {self.model_memory_mb.get()} MB\n\nMax MB of cached models before the oldest idle one is unloaded (0 = no limit):",
+            initialvalue=self.model_memory_mb.get(),
+            minvalue=0
+        )
+        if value is not None:
+            self.model_memory_mb.set(value)
+            self.apply_model_pool_settings()
+            save_config({**load_config(), "model_memory_mb": value})
+            self.feedback_label.config(text=f"⚙️ Model memory budget set to {value} MB" if value else "⚙️ No model memory budget")
+
+    def asr_runtime(self):
+        # compute_type / cpu_threads measured on this machine, else int8 defaults
+        return tuned_runtime(load_config().get(TUNING_KEY))
+
+    def start_tuning(self):
+        if not self.video_path.get():
+            messagebox.showwarning("Missing Video", "Please select a video; a minute of its audio is used for the benchmark.")
+            return
+        if not messagebox.askyesno("Tune ASR Performance",
+                                   f"Transcribe a 60-second excerpt under {len(tuning_grid())} settings combinations?\n"
+                                   "This loads the model once per combination and can take a while."):
+            return
+        self.set_stop_enabled(True)
+        self.status_label.config(text="Running ASR tuning…")
+        threading.Thread(target=self.run_tuning, daemon=True).start()
+
+    def run_tuning(self):
+        try:
+            self.stop_flag.clear()
+            model_path = ModelDownloader.ensure_model(WHISPER_REPO_ID, WHISPER_MODEL_DIR)
+            with self.pcm_cache.load(self.video_path.get(), find_ffmpeg()) as audio:
+                samples = tuning_excerpt(audio)
+            configs = tuning_grid()
+            done = []
+
+            def report(result):
+                done.append(result)
+                self.debug("[INFO] Tuning {}/{}: {}", len(done), len(configs), format_tuning(result))
+                self.root.after(0, lambda: self.progress.config(value=100 * len(done) / len(configs)))
+
+            results = tune(model_path, samples, self.beam_size.get(), configs, report, self.stop_flag)
+            record = best_record(results)
+            if record is None:
+                self.feedback_label.config(text="❌ ASR tuning: no configuration ran — see log")
+                return
+            save_config({**load_config(), TUNING_KEY: record})
+            MODEL_POOL.clear()  # later runs load with the tuned settings
+            self.debug("[INFO] Fastest ASR settings saved: {}", format_tuning(record))
+            self.feedback_label.config(
+                text=f"✅ ASR tuned: {record['compute_type']}, {record['cpu_threads']} threads, "
+                     f"RTF {record['rtf']:.2f}"
+            )
+        except Exception:
+            self.debug("[ERROR] run_tuning() crashed:\n{}", traceback.format_exc())
+            self.feedback_label.config(text="❌ ASR tuning failed — see log")
+        finally:
+            self.status_label.config(text="✔ Ready")
+            self.set_stop_enabled(False)
+
+    def show_job_history(self):
+        window = tk.Toplevel(self.root)
+        window.title("Job History")
+        window.geometry("1000x400")
+
+        text_widget = tk.Text(window, wrap="none", font=("Consolas", 9))
+        text_widget.insert("1.0", format_jobs(self.job_ledger.jobs(100)))
+        text_widget.config(state="disabled")
+        text_widget.pack(expand=True, fill="both")
+
+    def start_resume(self):
+        jobs = self.job_ledger.resumable()
+        if not jobs:
+            messagebox.showinfo("Resume Interrupted Job", "No interrupted jobs to resume.")
+            return
+        job = jobs[0]
+        name = os.path.basename(job["video"] or job["subtitle"] or "")
+        if not messagebox.askyesno("Resume Interrupted Job",
+                                   f"Resume job {job['id']} ({job['kind']}, {name})?\n"
+                                   f"Last completed stage: {job['last_stage'] or 'none'}\n\n"
+                                   "It runs again from the start; stages it already finished "
+                                   "are reused from the caches when still there."):
+            return
+        self.set_stop_enabled(True)
+        threading.Thread(target=self.run_resume, args=(job,), daemon=True).start()
+
+    def run_resume(self, job):
+        try:
+            model_path = draft_path = None
+            if job["kind"] != "sync-only":
+                model_path = ModelDownloader.ensure_model(WHISPER_REPO_ID, WHISPER_MODEL_DIR)
+            if job["kind"] == "sync" and job["settings"].get("two_tier_asr"):
+                draft_path = ModelDownloader.ensure_model(DRAFT_REPO_ID, DRAFT_MODEL_DIR)
+            core = self.sync_core(model_path, find_ffmpeg(), draft_path)
+            self.attach_whisper_logger()
+            try:
+                core.resume(job["id"])
+            finally:
+                self.detach_whisper_logger()
+            self.feedback_label.config(text=f"✅ Job {job['id']} resumed and finished → {os.path.basename(job['output'] or '')}")
+            self.status_label.config(text="✔ Sync complete", fg="#2e7d32")
+            self.progress["value"] = 100
+        except Exception:
+            self.debug("[ERROR] run_resume() crashed:\n{}", traceback.format_exc())
+            self.feedback_label.config(text="❌ Resume failed — see log")
+        finally:
+            self.set_stop_enabled(False)
+
+    def reset_tuning(self):
+        cfg = load_config()
+        cfg.pop(TUNING_KEY, None)
+        save_config(cfg)
+        MODEL_POOL.clear()
+        self.feedback_label.config(text="⚙️ ASR tuning reset to defaults (int8, automatic threads)")
+
+    def unload_models(self):
+        MODEL_POOL.clear()
+        self.debug("[INFO] Unloaded idle cached models")
+        self.feedback_label.config(text="⚙️ Cached models unloaded")
                             
       
     def transcribe_whisper(self, audio_path):
-        model = WhisperModel("large-v3", compute_type="int8")
+        model = MODEL_POOL.get("large-v3", **self.asr_runtime())
         return model.transcribe(
             audio_path,
             beam_size=self.beam_size.get(),
@@ -1337,52 +1527,87 @@ class SubtitleSyncApp:
             del self._whisper_log_handler
 
     def suggest_output_path(self):
-        video = self.video_path.get()
-        sub = self.subtitle_path.get()
-
-        if video:
-            base = os.path.splitext(os.path.basename(video))[0]
-            beam = self.beam_size.get()
-            granularity = "W" if self.word_level_asr.get() else "S"
-            tag = f"ASR{beam:02}{granularity}"
-            return os.path.join(os.path.dirname(video), f"{base}.{tag}.srt")
-        elif sub:
-            base = os.path.splitext(os.path.basename(sub))[0]
-            return os.path.join(os.path.dirname(sub), f"{base}.merged.srt")
-        return ""           
+        return output_name(self.video_path.get(), self.subtitle_path.get(), self.beam_size.get(), self.word_level_asr.get())
     
-    def capture_transcribe_output(self, model, audio_path):
-        segments = []
-        total_duration = self.get_audio_duration(audio_path)
-        start_time = time.time()
-
-        def update_ui(segment):
-            if not hasattr(segment, "text") or not segment.text.strip():
-                return
+    def preview_segments(self, segments):
+        # Fill the ASR preview pane in one go (cached results arrive all at once)
+        rows = [
+            (n, f"{self.format_timestamp(seg.start)} --> {self.format_timestamp(seg.end)}", seg.text.strip()[:80])
+            for n, seg in enumerate((seg for seg in segments if seg.text.strip()), start=1)
+        ]
+
+        def fill():
+            for row in rows:
+                self.right_tree.insert("", "end", values=row)
+            self.progress.config(value=100)
+
+        self.root.after(0, fill)
+
+    def segment_previewer(self):
+        # on_segment callback: one preview row per decoded segment, plus progress
+        shown = [0]
+
+        def update_ui(segment, total_duration):
+            shown[0] += 1
+            index = shown[0]
             timestamp = f"{self.format_timestamp(segment.start)} --> {self.format_timestamp(segment.end)}"
             text = segment.text.strip()[:80]  # Truncate for preview
-            index = len(segments) + 1
             self.root.after(0, lambda: self.right_tree.insert("", "end", values=(index, timestamp, text)))
-            percent = min((segment.end / total_duration) * 100, 100)
-            elapsed = time.time() - start_time
+            percent = min((segment.end / total_duration) * 100, 100) if total_duration else 0.0
             self.root.after(0, lambda: self.progress.config(value=percent))
             self.root.after(0, lambda: self.status_label.config(text=f"Transcribing… {percent:.1f}%"))
             self.root.after(0, lambda: self.feedback_label.config(text=f"💬 Whisper preview: {percent:.1f}%"))
 
-        for segment in self.interruptible_transcribe(model, audio_path, on_segment=update_ui):
-            segments.append(segment)
-            if self.stop_flag.is_set():
-                self.debug("[INFO] capture_transcribe_output() interrupted at segment {}", len(segments))
-                break
+        return update_ui
+
+    def sync_settings(self):
+        return SyncSettings(
+            beam_size=self.beam_size.get(),
+            word_level_asr=self.word_level_asr.get(),
+            lazy_word_timestamps=self.lazy_word_timestamps.get(),
+            chunk_size=self.chunk_size.get(),
+            chunk_step=self.chunk_step.get(),
+            match_threshold=self.match_threshold.get(),
+            merge_comments=self.merge_comments.get(),
+            candidate_search=self.candidate_search.get(),
+            use_time_window=self.use_time_window.get(),
+            alignment_engine=self.alignment_engine.get(),
+            distribute_unmatched=self.distribute_unmatched.get(),
+            targeted_asr=self.targeted_asr.get(),
+            probe_first=self.probe_first.get(),
+            two_tier_asr=self.two_tier_asr.get(),
+            batched_asr=self.batched_asr.get(),
+            batch_size=self.batch_size.get(),
+            asr_workers=self.asr_workers.get(),
+            bypass_asr_cache=self.bypass_asr_cache.get(),
+            runtime=self.asr_runtime()
+        )
 
-        return segments
+    def sync_core(self, model_path=None, ffmpeg_path="ffmpeg", draft_model_path=None):
+        # The pipeline itself lives in sync_core.py; the app supplies settings and UI callbacks
+        return SyncCore(
+            self.sync_settings(), model_path, ffmpeg_path, draft_model_path,
+            asr_cache=self.asr_cache,
+            pcm_cache=self.pcm_cache,
+            stop_flag=self.stop_flag,
+            log=lambda text: self.debug("{}", text),
+            on_stage=lambda text: self.status_label.config(text=text),
+            on_segment=self.segment_previewer(),
+            on_preview=self.preview_segments,
+            ledger=self.job_ledger
+        )
 
     def set_stop_enabled(self, enabled):
+        # Every run brackets itself with set_stop_enabled(True) / (False);
+        # a new run starts with a fresh stop flag (SyncCore leaves ours alone)
+        if enabled and not self.running:
+            self.stop_flag.clear()
+        self.running = enabled
         if hasattr(self, "btn_stop") and self.btn_stop:
             self.btn_stop.config(state="normal" if enabled else "disabled")    
     
     def is_transcribing(self):
-        return "transcrib" in self.status_label.cget("text").lower() or "sync" in self.status_label.cget("text").lower()
+        return self.running
 
     def set_ribbon_enabled(self, enabled: bool):
         state = "normal" if enabled else "disabled"
@@ -1397,60 +1622,6 @@ class SubtitleSyncApp:
         # Removes punctuation but preserves contractions (e.g., "don't")
         return re.sub(r"[^\w']+", "", text).strip()    
     
-    def interruptible_transcribe(self, model, audio_path, on_segment=None):
-        try:
-            segment_gen, _ = model.transcribe(
-                audio_path,
-                beam_size=self.beam_size.get(),
-                word_timestamps=True
-            )
-            for segment in segment_gen:
-                if self.stop_flag.is_set():
-                    self.debug("[INFO] Transcription interrupted by user flag.")
-                    break
-                if on_segment:
-                    on_segment(segment)
-                yield segment
-        except Exception as e:
-            self.debug("[ERROR] Transcription error: {}", e)    
-
-    def adjust_unmatched_timing(self, original_blocks, matched_map):
-        adjusted = []
-
-        for i, block in enumerate(original_blocks):
-            if i not in matched_map:
-                # Try to find nearby matched neighbors
-                prev = next((j for j in range(i - 1, -1, -1) if j in matched_map), None)
-                next_ = next((j for j in range(i + 1, len(original_blocks)) if j in matched_map), None)
-
-                if prev is not None and next_ is not None:
-                    prev_end = self.parse_srt_time(original_blocks[prev]["end"])
-                    next_start = self.parse_srt_time(original_blocks[next_]["start"])
-                    duration = self.parse_srt_time(block["end"]) - self.parse_srt_time(block["start"])
-
-                    # Choose midpoint or best-fit within gap
-                    mid = prev_end + ((next_start - prev_end - duration) / 2)
-                    new_start = max(prev_end + 0.1, mid)
-                    new_end = min(new_start + duration, next_start - 0.1)
-
-                    block["start"] = self.format_timestamp(new_start)
-                    block["end"] = self.format_timestamp(new_end)
-                    block["adjusted"] = True  # Optional: for tagging in UI
-                else:
-                    block["adjusted"] = False  # No safe neighbors, leave as-is
-
-            adjusted.append(block)
-
-        return adjusted   
-
-    def create_menu_bar(self):
-        menu_bar = tk.Menu(self.root)
-        # … existing menus …
-        pref_menu = tk.Menu(menu_bar, tearoff=0)
-        pref_menu.add_command(label="Clear Saved Paths", command=self.clear_saved_paths)
-        menu_bar.add_cascade(label="Preferences", menu=pref_menu)
-        self.root.config(menu=menu_bar)
-
     def clear_saved_paths(self):
         if messagebox.askyesno("Clear Defaults", "Remove saved file paths?"):
             try:
@@ -1461,13 +1632,22 @@ class SubtitleSyncApp:
             self.update_status_bar()
             self.feedback_label.config(text="⚙️ Saved paths cleared.")        
 
+    def clear_asr_cache(self):
+        if messagebox.askyesno("Clear ASR Cache", "Delete all cached transcriptions?"):
+            self.asr_cache.clear()
+            self.feedback_label.config(text="⚙️ ASR result cache cleared.")
+
+    def clear_pcm_cache(self):
+        if messagebox.askyesno("Clear Audio Cache", "Delete all cached decoded audio?"):
+            self.pcm_cache.clear()
+            self.feedback_label.config(text="⚙️ Decoded audio cache cleared.")
+
     def parse_srt_time(self, ts):
-        from datetime import datetime
-        t = datetime.strptime(ts.strip(), "%H:%M:%S,%f")
-        return t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1_000_000                
+        return srt_time_to_ms(ts) / 1000                
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # parallel ASR workers in the frozen .exe
     root = tk.Tk()  
     app = SubtitleSyncApp(root)
     root.mainloop()                
\ No newline at end of file
@@ -0,0 +1,207 @@
+# subtitle_track.py
+#
+# SubtitleTrack: one subtitle file held as parallel arrays instead of a list of
+# per-cue dicts. Times are int ms (see srt_time.py), flags are a bitfield.
+
+import numpy as np
+
+from srt_time import ms_to_srt_time, seconds_to_ms, srt_time_to_ms
+
+
+COMMENT = 1    # [bracketed] cue, keeps its own timing
+MATCHED = 2    # retimed from an ASR match
+ADJUSTED = 4   # retimed by interpolating between matched neighbours
+
+
+def int_array(values=()):
+    return np.array(values, dtype=np.int64)
+
+
+def flag_array(values=()):
+    return np.array(values, dtype=np.uint8)
+
+
+class SubtitleTrack:
+    """
+    starts / ends : int64 ms arrays
+    texts         : list of cue text (lines joined with a space)
+    flags         : uint8 bitfield per cue (COMMENT | MATCHED | ADJUSTED)
+
+    Slicing returns a track over the same arrays (a view), and
+    shifted() / scaled() retime the whole track in one vector operation.
+    tokens caches TokenVocab output for the vocab in token_vocab.
+    """
+
+    __slots__ = ("starts", "ends", "texts", "flags", "tokens", "token_vocab")
+
+    def __init__(self, starts=(), ends=(), texts=(), flags=None):
+        self.starts = starts if hasattr(starts, "dtype") else int_array(starts)
+        self.ends = ends if hasattr(ends, "dtype") else int_array(ends)
+        self.texts = list(texts)
+        if flags is None:
+            flags = flag_array([0] * len(self.texts))
+        elif not hasattr(flags, "dtype"):
+            flags = flag_array(flags)
+        self.flags = flags
+        self.tokens = None
+        self.token_vocab = None
+
+    # ─── Construction ───────────────────────────────────────
+    @classmethod
+    def from_lines(cls, lines):
+        """Parse SRT lines; timestamps are decoded to int ms here, once."""
+        starts, ends, texts = [], [], []
+        start = end = 0
+        text = []
+        state = 0
+
+        for line in lines:
+            stripped = line.strip()
+            if not stripped:
+                if text:
+                    starts.append(start)
+                    ends.append(end)
+                    texts.append(" ".join(text))
+                    start = end = 0
+                    text = []
+                state = 0
+            elif state == 0:
+                state = 1  # index line
+            elif state == 1:
+                try:
+                    a, b = stripped.split("-->")
+                    start, end = srt_time_to_ms(a.strip()), srt_time_to_ms(b.strip())
+                    state = 2
+                except ValueError:
+                    continue
+            else:
+                text.append(stripped)
+
+        if text:
+            starts.append(start)
+            ends.append(end)
+            texts.append(" ".join(text))
+
+        return cls(starts, ends, texts)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8-sig") as f:
+            return cls.from_lines(f)
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Build a track from faster-whisper segments (float seconds)."""
+        segments = [seg for seg in segments if seg.text.strip()]
+        return cls(
+            [seconds_to_ms(seg.start) for seg in segments],
+            [seconds_to_ms(seg.end) for seg in segments],
+            [seg.text.strip() for seg in segments]
+        )
+
+    # ─── Access ─────────────────────────────────────────────
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return SubtitleTrack(self.starts[key], self.ends[key], self.texts[key], self.flags[key])
+        return int(self.starts[key]), int(self.ends[key]), self.texts[key], int(self.flags[key])
+
+    def has_flag(self, i, flag):
+        return bool(self.flags[i] & flag)
+
+    def set_flag(self, i, flag):
+        self.flags[i] = self.flags[i] | flag
+
+    def copy(self):
+        return SubtitleTrack(self.starts.copy(), self.ends.copy(), self.texts, self.flags.copy())
+
+    # ─── Whole-track retiming ───────────────────────────────
+    def shifted(self, offset_ms):
+        """Copy of the track moved by offset_ms."""
+        return SubtitleTrack(self.starts + offset_ms, self.ends + offset_ms, self.texts, self.flags.copy())
+
+    def scaled(self, factor, origin_ms=0):
+        """Copy of the track stretched by factor around origin_ms (framerate fixes)."""
+        starts = np.rint((self.starts - origin_ms) * factor).astype(np.int64) + origin_ms
+        ends = np.rint((self.ends - origin_ms) * factor).astype(np.int64) + origin_ms
+        return SubtitleTrack(starts, ends, self.texts, self.flags.copy())
+
+    # ─── Output ─────────────────────────────────────────────
+    def to_srt_lines(self):
+        """SRT text as a list of '\\n'-terminated lines, renumbered from 1."""
+        out = []
+        for n, (start, end, text) in enumerate(zip(self.starts.tolist(), self.ends.tolist(), self.texts), start=1):
+            out.extend([
+                f"{n}\n",
+                f"{ms_to_srt_time(start)} --> {ms_to_srt_time(end)}\n",
+                f"{text}\n",
+                "\n"
+            ])
+        return out
+
+    def write(self, path, newline="\r\n"):
+        with open(path, "w", encoding="utf-8", newline=newline) as f:
+            f.writelines(self.to_srt_lines())
+
+
+def retime_unmatched(track, proportional=False, gap_ms=100, min_ms=500):
+    """
+    Move every unmatched cue that sits between two MATCHED cues into the gap
+    between them, in O(N): one forward and one backward pass find each cue's
+    previous and next matched neighbour, then all cues are retimed at once.
+
+    Default: each cue keeps its duration and is centred in the gap on its own
+    (the midpoint is floored to whole ms, as the old float-seconds code
+    truncated it when formatting).
+    proportional=True: each run of unmatched cues moves as a block, keeping its
+    internal spacing, and is compressed to fit if the gap is too small.
+    Cues stay gap_ms clear of the matched neighbours where the gap allows; in
+    either mode no cue is cut below min_ms (or its own duration, if shorter),
+    even when that makes it overrun a gap that is too small. COMMENT cues and
+    cues without a matched neighbour on both sides are left alone.
+    """
+    n = len(track)
+    if not n:
+        return track
+
+    starts, ends, flags = track.starts, track.ends, track.flags
+    pos = np.arange(n)
+    matched = (flags & MATCHED) != 0
+    prev = np.maximum.accumulate(np.where(matched, pos, -1))
+    nxt = np.minimum.accumulate(np.where(matched, pos, n)[::-1])[::-1]
+    movable = ((flags & (MATCHED | COMMENT)) == 0) & (prev >= 0) & (nxt < n)
+    t = np.nonzero(movable)[0]
+    if not len(t):
+        return track
+
+    prev_end = ends[prev[t]]
+    next_start = starts[nxt[t]]
+    cue_start, cue_end = starts[t], ends[t]
+
+    if not proportional:
+        duration = cue_end - cue_start
+        mid = prev_end + (next_start - prev_end - duration) // 2
+        new_start = np.maximum(prev_end + gap_ms, mid)
+        new_end = np.minimum(new_start + duration, next_start - gap_ms)
+        new_end = np.maximum(new_end, new_start + np.minimum(duration, min_ms))
+    else:
+        # Runs are contiguous in t and share a previous matched neighbour
+        run_first = np.flatnonzero(np.diff(prev[t], prepend=-2))
+        run_id = np.repeat(np.arange(len(run_first)), np.diff(np.append(run_first, len(t))))
+        run_lo = np.minimum.reduceat(cue_start, run_first)[run_id]
+        run_hi = np.maximum.reduceat(cue_end, run_first)[run_id]
+        room_lo = prev_end + gap_ms
+        room = (next_start - gap_ms) - room_lo
+        span = run_hi - run_lo
+        scale = np.where(span > 0, np.minimum(1.0, np.maximum(room, 0) / np.maximum(span, 1)), 1.0)
+        offset = room_lo + (room - span * scale) / 2
+        new_start = np.rint(offset + (cue_start - run_lo) * scale).astype(np.int64)
+        new_end = np.rint(offset + (cue_end - run_lo) * scale).astype(np.int64)
+        new_end = np.maximum(new_end, new_start + np.minimum(cue_end - cue_start, min_ms))
+
+    starts[t] = new_start
+    ends[t] = new_end
+    flags[t] |= ADJUSTED
+    return track
@@ -0,0 +1,608 @@
+# sync_core.py
+#
+# The sync pipeline without a GUI: ASR (cached, streamed, windowed, parallel or
+# two-tier), merging ASR against the original cues, and writing the result.
+# SubtitleSyncApp fills a SyncSettings from its Tk variables and runs a
+# SyncCore; the command line (subsync.py) fills one from flags.
+
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from alignment import align_monotonic, asr_word_sequence
+from asr_cache import AsrCache, media_fingerprint
+from asr_windows import cue_windows, transcribe_windows, windows_seconds
+from audio_stream import SAMPLE_RATE, PcmStream, stream_transcribe
+from autotune import DEFAULT_RUNTIME
+from matching import (
+    ChunkIndex, SparseScorer, TokenVocab, best_chunk_exhaustive,
+    search_windows
+)
+from model_pool import MODEL_POOL, batched_pipeline
+from parallel_asr import ParallelTranscriber, get_parallel_transcriber
+from pcm_cache import PcmCache, PcmFile
+from probe_sync import estimate_offset_drift
+from subtitle_track import COMMENT, MATCHED, SubtitleTrack, retime_unmatched
+from two_tier import MAX_REDO_COVERAGE, splice_segments, uncertain_windows
+from word_refine import refine_cues, segment_words, segments_needing_words, words_in_spans
+
+WHISPER_REPO_ID = "openai/whisper-large-v3"
+WHISPER_MODEL_DIR = "models/whisper-large-v3"
+DRAFT_REPO_ID = "Systran/faster-whisper-small"  # first tier of two-tier ASR
+DRAFT_MODEL_DIR = "models/whisper-small"
+
+
+class SyncSettings:
+    """Every setting the pipeline reads, with the GUI's defaults."""
+
+    DEFAULTS = dict(
+        beam_size=5,
+        word_level_asr=True,
+        lazy_word_timestamps=False,
+        chunk_size=8,
+        chunk_step=2,
+        match_threshold=10.0,     # seconds either side of a cue to search
+        merge_comments=True,      # [bracketed] cues keep their own timing
+        candidate_search="sparse",  # sparse | index | exhaustive | compare
+        use_time_window=True,
+        alignment_engine="greedy",  # greedy | dp
+        distribute_unmatched=False,
+        targeted_asr=False,
+        probe_first=False,
+        two_tier_asr=False,
+        batched_asr=False,
+        batch_size=8,
+        asr_workers=1,
+        bypass_asr_cache=False,
+        runtime=None,             # compute_type / cpu_threads / num_workers, see autotune.tuned_runtime
+    )
+
+    def __init__(self, **values):
+        unknown = set(values) - set(self.DEFAULTS)
+        if unknown:
+            raise TypeError(f"Unknown sync settings: {', '.join(sorted(unknown))}")
+        for name, default in self.DEFAULTS.items():
+            setattr(self, name, values.get(name, default))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.DEFAULTS}
+
+
+class SyncResult:
+    """What a pipeline run produced: the output track plus how it got there."""
+
+    def __init__(self, track, method, matched=None, fit=None, segments=None):
+        self.track = track
+        self.method = method      # "asr", "probe" or "sync-only"
+        self.matched = matched    # MATCHED cues, None when no matching ran
+        self.fit = fit            # ProbeFit when method == "probe"
+        self.segments = segments
+
+    @property
+    def ratio(self):
+        return self.matched / len(self.track) if self.matched is not None and len(self.track) else None
+
+
+def output_name(video=None, subtitle=None, beam_size=5, word_level_asr=True):
+    """Default export path: <video>.ASR05W.srt next to the video, else <subtitle>.merged.srt."""
+    if video:
+        base = os.path.splitext(os.path.basename(video))[0]
+        granularity = "W" if word_level_asr else "S"
+        tag = f"ASR{beam_size:02}{granularity}"
+        return os.path.join(os.path.dirname(video), f"{base}.{tag}.srt")
+    elif subtitle:
+        base = os.path.splitext(os.path.basename(subtitle))[0]
+        return os.path.join(os.path.dirname(subtitle), f"{base}.merged.srt")
+    return ""
+
+
+def read_track(path):
+    with open(path, encoding="utf-8") as f:
+        return SubtitleTrack.from_lines(f.readlines())
+
+
+class SyncCore:
+    """
+    One configured pipeline. Callbacks (all optional) keep a front end informed:
+      log(text)                    — one debug line
+      on_stage(text)               — the current stage ("Decoding audio…"), for display only
+      on_segment(segment, seconds) — each ASR segment as it is decoded, with the audio length
+      on_preview(segments)         — a whole transcript at once (ASR cache hit)
+    stop_flag (threading.Event) interrupts transcription; a partial transcript is never cached.
+    Without one the core makes its own, which each pipeline (asr, sync,
+    sync_only) clears as it starts. A caller-supplied flag is never cleared
+    here: the caller resets it between runs, and a cancel set before the
+    pipeline starts is honoured.
+    ledger (job_ledger.JobLedger) records each pipeline run and its stage timings.
+    """
+
+    def __init__(self, settings=None, model_path=None, ffmpeg_path="ffmpeg", draft_model_path=None,
+                 asr_cache=None, pcm_cache=None, stop_flag=None,
+                 log=None, on_stage=None, on_segment=None, on_preview=None, ledger=None):
+        self.settings = settings or SyncSettings()
+        self.model_path = model_path
+        self.ffmpeg_path = ffmpeg_path
+        self.draft_model_path = draft_model_path
+        self.asr_cache = asr_cache if asr_cache is not None else AsrCache()
+        self.pcm_cache = pcm_cache if pcm_cache is not None else PcmCache()
+        self.stop_flag = stop_flag if stop_flag is not None else threading.Event()
+        self._owns_stop_flag = stop_flag is None
+        self._log = log or (lambda text: print(text, flush=True))
+        self._on_stage = on_stage
+        self.on_segment = on_segment
+        self.on_preview = on_preview
+        self.ledger = ledger
+        self.job_id = None      # ledger id of the running pipeline
+        self._resume_id = None  # ledger id the next pipeline continues, see resume()
+
+    def log(self, msg, *args):
+        self._log(msg.format(*args))
+
+    def stage(self, text):
+        if self._on_stage:
+            self._on_stage(text)
+
+    @property
+    def tolerance_ms(self):
+        return int(round(self.settings.match_threshold * 1000))
+
+    def reset_stop(self):
+        # A Stop left on our own flag by an earlier run must not cut this one short
+        if self._owns_stop_flag:
+            self.stop_flag.clear()
+
+    # ─── Job ledger ─────────────────────────────────────────
+    @contextmanager
+    def recorded(self, kind, **inputs):
+        """Ledger entry around one pipeline run; the pipeline fills in the yielded outcome dict."""
+        outcome = {}
+        if self.ledger is None:
+            yield outcome
+            return
+        if self._resume_id is not None:
+            self.job_id, self._resume_id = self._resume_id, None
+            self.ledger.reopen(self.job_id)
+        else:
+            self.job_id = self.ledger.start(kind, self.settings.as_dict(), **inputs)
+        try:
+            yield outcome
+        except BaseException as e:
+            state = "interrupted" if isinstance(e, KeyboardInterrupt) else "failed"
+            self.ledger.finish(self.job_id, state, error=f"{type(e).__name__}: {e}")
+            raise
+        else:
+            self.ledger.finish(self.job_id, "interrupted" if self.stop_flag.is_set() else "done", **outcome)
+        finally:
+            self.job_id = None
+
+    @contextmanager
+    def timed(self, stage):
+        # A stage counts as completed only if it ran to the end without a Stop
+        started = time.perf_counter()
+        yield
+        if self.ledger is not None and self.job_id is not None and not self.stop_flag.is_set():
+            self.ledger.stage_done(self.job_id, stage, time.perf_counter() - started)
+
+    def resume(self, job_id):
+        """
+        Run an interrupted ledger job again, from the start, with its recorded
+        inputs and settings. No stage is skipped: completed ones are cheap only
+        when their results are still in the PCM and ASR caches, so a crash after
+        ASR costs just the merge, but an evicted transcript is redone.
+        """
+        job = self.ledger.job(job_id) if self.ledger is not None else None
+        if job is None:
+            raise ValueError(f"No job {job_id} in the ledger")
+        settings = {k: v for k, v in job["settings"].items() if k in SyncSettings.DEFAULTS}
+        self.settings = SyncSettings(**dict(settings, bypass_asr_cache=False))  # its own finished ASR is wanted
+        self.log("[INFO] Resuming job {} ({}) after stage {}", job_id, job["kind"], job["last_stage"] or "none")
+        self._resume_id = job_id
+        if job["kind"] == "asr":
+            return self.asr(job["video"], job["output"])
+        if job["kind"] == "sync":
+            return self.sync(job["video"], job["subtitle"], job["output"])
+        return self.sync_only(job["subtitle"], job["asr_srt"], job["output"])
+
+    # ─── Pipelines ──────────────────────────────────────────
+    def asr(self, video, output=None):
+        """Transcribe video; write the transcript as SRT when output is given. Returns the segments."""
+        self.reset_stop()
+        with self.recorded("asr", video=video, output=output) as outcome:
+            self.stage("🎙️ Decoding audio…")
+            segments = self.transcribe_video(video)
+            if output:
+                with self.timed("write"):
+                    SubtitleTrack.from_segments(segments).write(output)
+            outcome.update(method="asr", cues=sum(1 for seg in segments if seg.text.strip()))
+            return segments
+
+    def sync(self, video, subtitle_path, output=None):
+        """Full pipeline: ASR on video, then retime the original subtitle to it."""
+        self.reset_stop()
+        with self.recorded("sync", video=video, subtitle=subtitle_path, output=output) as outcome:
+            result = self._sync(video, subtitle_path, output)
+            outcome.update(method=result.method, matched=result.matched, cues=len(result.track))
+            return result
+
+    def _sync(self, video, subtitle_path, output):
+        original = read_track(subtitle_path)
+
+        # Quick pre-pass: a plain offset or framerate change needs no full ASR
+        if self.settings.probe_first:
+            fit = self.probe(video, original)
+            if fit is not None:
+                track = fit.apply(original)
+                if output:
+                    with self.timed("write"):
+                        track.write(output)
+                self.log("[INFO] Synced from probes, full ASR skipped")
+                return SyncResult(track, "probe", fit=fit)
+
+        # Targeted ASR: only the audio around the original cues is transcribed
+        windows = None
+        if self.settings.targeted_asr:
+            windows = cue_windows(original, self.tolerance_ms, skip_comments=self.settings.merge_comments)
+            self.log("[INFO] Targeted ASR: {} windows covering {:.0f} s of audio", len(windows), windows_seconds(windows))
+
+        # Reuse a cached transcription, or decode and transcribe
+        self.stage("🔁 Decoding audio…")
+        if self.settings.two_tier_asr:
+            segments = self.two_tier_transcribe(video, original, windows)
+        else:
+            segments = self.transcribe_video(video, windows)
+
+        self.stage("🔗 Synchronizing subtitles…")
+        word_source = self.word_source(video, segments) if self.settings.word_level_asr else None
+        with self.timed("merge"):
+            track = self.merge_tracks(original, SubtitleTrack.from_segments(segments), word_source)
+        if output:
+            with self.timed("write"):
+                track.write(output)
+        return SyncResult(track, "asr", matched=count_matched(track), segments=segments)
+
+    def sync_only(self, original_path, asr_path, output=None):
+        """Retime an original subtitle to an existing ASR .srt; no audio involved."""
+        self.reset_stop()
+        with self.recorded("sync-only", subtitle=original_path, asr_srt=asr_path, output=output) as outcome:
+            with self.timed("merge"):
+                track = self.merge_tracks(read_track(original_path), read_track(asr_path))
+            if output:
+                with self.timed("write"):
+                    track.write(output)
+            outcome.update(method="sync-only", matched=count_matched(track), cues=len(track))
+            return SyncResult(track, "sync-only", matched=count_matched(track))
+
+    def probe(self, video, original):
+        """
+        Transcribe a few short probes and fit offset + scale. Returns the fit
+        when it is clean, else None and the caller runs the full pipeline.
+        """
+        self.stage("🔎 Probing offset/drift…")
+        with self.timed("ffmpeg"):
+            audio = self.pcm_cache.load(video, self.ffmpeg_path)
+        with ExitStack() as stack:
+            stack.enter_context(audio)
+            with self.timed("model_load"):
+                model = stack.enter_context(MODEL_POOL.lease(self.model_path, **self.runtime))
+            with self.timed("asr"):
+                fit = estimate_offset_drift(model, audio, original, self.tolerance_ms,
+                                            stop_flag=self.stop_flag, beam_size=self.settings.beam_size)
+        if self.stop_flag.is_set():
+            self.log("[INFO] Probe interrupted by user flag.")
+            return None
+        self.log("[INFO] Probe fit: {}", fit)
+        if not fit.good(self.tolerance_ms):
+            self.log("[INFO] Probe fit not reliable, falling back to full ASR sync")
+            return None
+        return fit
+
+    # ─── ASR ────────────────────────────────────────────────
+    @property
+    def runtime(self):
+        return dict(self.settings.runtime or DEFAULT_RUNTIME)
+
+    def asr_options(self):
+        # Everything passed to model.transcribe() that changes its output
+        # Lazy word timestamps: decode segment-level, align words after matching
+        word_timestamps = self.settings.word_level_asr and not self.settings.lazy_word_timestamps
+        return dict(beam_size=self.settings.beam_size, word_timestamps=word_timestamps)
+
+    def model_id(self, model_path):
+        return f"{os.path.basename(os.path.normpath(model_path))}/{self.runtime['compute_type']}"
+
+    def transcribe_video(self, video, windows=None, model_path=None):
+        """
+        Segments for video: from the ASR result cache when this audio was
+        already transcribed with the same model and options, otherwise
+        streamed through Whisper and stored for next time.
+        windows: (start_ms, end_ms) spans to transcribe instead of the whole file.
+        """
+        model_path = model_path or self.model_path
+        options = self.asr_options()
+        runtime = self.runtime
+        model_id = self.model_id(model_path)
+        if self.settings.batched_asr and windows is None and self.settings.asr_workers <= 1:
+            model_id += "/batched"  # VAD-chunked batches segment differently
+        cache_key = AsrCache.key(media_fingerprint(video), model_id, options["beam_size"], options["word_timestamps"], clips=windows)
+
+        if not self.settings.bypass_asr_cache:
+            segments = self.asr_cache.get(cache_key)
+            if segments is not None:
+                self.log("[INFO] ASR cache hit ({} segments), skipping transcription", len(segments))
+                if self.on_preview:
+                    self.on_preview(segments)
+                return segments
+
+        # Windows and parallel workers need random access, so the whole track is decoded (or cached) first.
+        # So does the batched engine: its VAD chunks run up to 30 s, and only the
+        # whole file gives it enough of them to fill a batch
+        parallel = windows is None and self.settings.asr_workers > 1
+        batched = windows is None and not parallel and self.settings.batched_asr
+        # A streamed decode runs alongside ASR, so its time is part of the asr stage
+        with self.timed("ffmpeg"):
+            if windows is None and not parallel and not batched:
+                audio = self.open_audio(video)
+            else:
+                audio = self.pcm_cache.load(video, self.ffmpeg_path)
+        with ExitStack() as stack:
+            stack.enter_context(audio)
+            with self.timed("model_load"):
+                if parallel:
+                    model = get_parallel_transcriber(model_path, self.settings.asr_workers, compute_type=runtime["compute_type"])
+                    self.log("[INFO] Parallel ASR across {} worker processes", model.workers)
+                else:
+                    model = stack.enter_context(MODEL_POOL.lease(model_path, **runtime))
+            with self.timed("asr"):
+                segments = self.transcribe(model, audio, windows)
+
+        if not self.stop_flag.is_set():  # never cache a partial transcript
+            self.asr_cache.put(cache_key, segments, video=os.path.basename(video), model=model_id, **options)
+            self.log("[INFO] Stored transcription in ASR cache ({})", cache_key)
+        return segments
+
+    def two_tier_transcribe(self, video, original, windows=None):
+        """
+        Draft the whole track with the small model, merge, and re-transcribe with
+        the large model only around cues that found no match and draft segments
+        Whisper itself was unsure of. Both models stay in MODEL_POOL.
+        """
+        if not self.draft_model_path:
+            raise ValueError("Two-tier ASR needs a draft model path")
+        MODEL_POOL.prewarm(self.model_path, **self.runtime)  # loads while the draft runs
+        self.log("[INFO] Two-tier ASR: drafting with {}", self.draft_model_path)
+        draft = self.transcribe_video(video, windows, model_path=self.draft_model_path)
+        if self.stop_flag.is_set():
+            return draft
+
+        result = self.merge_tracks(original, SubtitleTrack.from_segments(draft))
+        redo = uncertain_windows(result, draft, original, skip_comments=self.settings.merge_comments)
+        if not redo:
+            self.log("[INFO] Two-tier ASR: draft matched everywhere, large model not needed")
+            return draft
+
+        total_s = windows_seconds(windows) if windows else max((seg.end for seg in draft), default=0.0)
+        coverage = min(1.0, windows_seconds(redo) / total_s) if total_s else 1.0
+        if coverage > MAX_REDO_COVERAGE:
+            self.log("[INFO] Two-tier ASR: {:.0%} of the audio is uncertain, running the large model on all of it", coverage)
+            self.stage("🔁 Transcribing with the large model…")
+            return self.transcribe_video(video, windows)
+
+        self.log("[INFO] Two-tier ASR: {} uncertain regions ({:.0f} s, {:.0%} of the audio) go to the large model",
+                 len(redo), windows_seconds(redo), coverage)
+        self.stage("🔁 Refining uncertain regions…")
+        refined = self.transcribe_video(video, redo)
+        return splice_segments(draft, refined, redo)
+
+    def word_source(self, video, segments):
+        """
+        Word timings for ASR segments, by position in SubtitleTrack.from_segments():
+        taken from the segments when they were decoded with word timestamps,
+        otherwise (lazy mode) by re-transcribing just those segments' spans.
+        """
+        segments = [seg for seg in segments if seg.text.strip()]
+
+        def words_for(positions):
+            if all(segments[j].words for j in positions):
+                return {j: segment_words(segments[j]) for j in positions}
+
+            needed = SubtitleTrack.from_segments([segments[j] for j in positions])
+            windows = cue_windows(needed, 250, skip_comments=False)
+            options = dict(self.asr_options(), word_timestamps=True)
+            model_id = self.model_id(self.model_path)
+            cache_key = AsrCache.key(media_fingerprint(video), model_id, options["beam_size"], True, clips=windows)
+            found = None if self.settings.bypass_asr_cache else self.asr_cache.get(cache_key)
+            if found is None:
+                self.log("[INFO] Aligning words in {} segments ({:.0f} s of audio)", len(positions), windows_seconds(windows))
+                with MODEL_POOL.lease(self.model_path, **self.runtime) as model, self.pcm_cache.load(video, self.ffmpeg_path) as audio:
+                    found = list(transcribe_windows(model, audio, windows, **options))
+                self.asr_cache.put(cache_key, found, video=os.path.basename(video), model=model_id, **options)
+            spans = list(zip(needed.starts.tolist(), needed.ends.tolist()))
+            return dict(zip(positions, words_in_spans(found, spans)))
+
+        return words_for
+
+    def open_audio(self, video):
+        # Decoded PCM from an earlier run, else stream from ffmpeg and cache it
+        audio = self.pcm_cache.open(video)
+        if audio is not None:
+            self.log("[INFO] Using cached decoded audio ({:.0f} s)", audio.duration)
+            return audio
+        return PcmStream(video, self.ffmpeg_path, tee=self.pcm_cache.writer(video))
+
+    def transcribe(self, model, audio, windows=None):
+        """All segments of audio (PcmStream / PcmFile), reporting each to on_segment."""
+        segments = []
+        duration = getattr(audio, "duration", None)
+        for segment in self.interruptible_transcribe(model, audio, windows):
+            segments.append(segment)
+            if self.on_segment and segment.text.strip():
+                # Unknown length (no ffprobe): measure against what has been decoded so far
+                self.on_segment(segment, duration or getattr(audio, "samples_read", 0) / SAMPLE_RATE)
+            if self.stop_flag.is_set():
+                self.log("[INFO] Transcription interrupted at segment {}", len(segments))
+                break
+        return segments
+
+    def interruptible_transcribe(self, model, audio, windows=None):
+        try:
+            options = self.asr_options()
+            if self.settings.batched_asr and windows is None and not isinstance(model, ParallelTranscriber):
+                # VAD-segmented chunks decoded batch_size at a time; still yields as batches finish
+                pipeline = batched_pipeline(model)
+                if pipeline is None:
+                    self.log("[WARN] This faster-whisper has no BatchedInferencePipeline; using the sequential engine")
+                else:
+                    model = pipeline
+                    options["batch_size"] = self.settings.batch_size
+            if isinstance(model, ParallelTranscriber):
+                segment_gen = model.transcribe_file(audio, stop_flag=self.stop_flag, **options)
+            elif windows is not None:
+                segment_gen = transcribe_windows(model, audio, windows, **options)
+            elif isinstance(audio, PcmStream):
+                segment_gen = stream_transcribe(model, audio, **options)
+            elif isinstance(audio, PcmFile):
+                segment_gen, _ = model.transcribe(audio.float32(), **options)
+            else:
+                segment_gen, _ = model.transcribe(audio, **options)
+            for segment in segment_gen:
+                if self.stop_flag.is_set():
+                    self.log("[INFO] Transcription interrupted by user flag.")
+                    break
+                yield segment
+        except Exception as e:
+            self.log("[ERROR] Transcription error: {}", e)
+            raise  # a failed decode must never look like a finished (cacheable) transcript
+
+    # ─── Merge ──────────────────────────────────────────────
+    def merge_tracks(self, original_lines, asr_lines, word_source=None):
+        # Either argument may be raw SRT lines or an already parsed SubtitleTrack
+        # word_source(asr positions) -> {position: words}, see word_source()
+        original = original_lines if isinstance(original_lines, SubtitleTrack) else SubtitleTrack.from_lines(original_lines)
+        asr = asr_lines if isinstance(asr_lines, SubtitleTrack) else SubtitleTrack.from_lines(asr_lines)
+        chunks = self.chunk_asr_blocks(asr, self.settings.chunk_size, self.settings.chunk_step)
+        threshold = self.settings.match_threshold
+        confidence_threshold = 0.5  # 🔧 Adjustable later
+        tolerance_ms = int(round(threshold * 1000))
+        search = self.settings.candidate_search
+
+        # Output starts as a copy of the original; matched cues are retimed in place
+        result = original.copy()
+        if self.settings.merge_comments:
+            for i, text in enumerate(result.texts):
+                if text.startswith("[") and text.endswith("]"):
+                    result.set_flag(i, COMMENT)  # Comments keep their own timing
+
+        # Cues that take part in matching
+        cue_positions = [i for i in range(len(result)) if not result.has_flag(i, COMMENT)]
+
+        # Tokenize every chunk and cue once
+        vocab = TokenVocab()
+        vocab.tokens_for(chunks)
+        cue_tokens = vocab.tokens_for(result)
+        chunk_index = ChunkIndex(chunks, vocab) if search in ("index", "compare") else None
+        chunk_starts, chunk_ends = chunks.starts.tolist(), chunks.ends.tolist()
+        cue_starts, cue_ends = result.starts.tolist(), result.ends.tolist()
+        mismatches = 0
+        widened = 0
+
+        def cue_windows(i):
+            if not self.settings.use_time_window:
+                return [None]
+            return list(search_windows(cue_starts[i], cue_ends[i], tolerance_ms))
+
+        aligned = None
+        picked = None
+        if self.settings.alignment_engine == "dp":
+            cues = [(result.texts[i], cue_starts[i], cue_ends[i]) for i in cue_positions]
+            started = time.time()
+            matches = align_monotonic(cues, asr_word_sequence(asr), tolerance_ms, confidence_threshold)
+            aligned = {cue_positions[pos]: match for pos, match in matches.items()}
+            self.log("[INFO] DP alignment matched {}/{} lines in {:.2f}s", len(aligned), len(cues), time.time() - started)
+        elif search in ("sparse", "compare"):
+            # Score every cue in one vectorized pass
+            scorer = SparseScorer(chunks, vocab)
+            picks = scorer.best_matches_widening(
+                [cue_tokens[i] for i in cue_positions],
+                confidence_threshold,
+                [cue_windows(i) for i in cue_positions]
+            )
+            picked = dict(zip(cue_positions, picks))
+
+        for i in cue_positions:
+            timing = None
+            if aligned is not None:
+                match = aligned.get(i)
+                timing = match and match[:2]
+            else:
+                if search == "sparse":
+                    best_pos, best_score, attempt = picked[i]
+                    widened += best_pos is not None and attempt > 0
+                    windows = []
+                else:
+                    windows = cue_windows(i)
+
+                # Try the tolerance window first; widen only if nothing matched
+                for attempt, window in enumerate(windows):
+                    if chunk_index is None:
+                        best_pos, best_score = best_chunk_exhaustive(cue_tokens[i], chunks, confidence_threshold, window)
+                    else:
+                        best_pos, best_score = chunk_index.best_match(cue_tokens[i], confidence_threshold, window)
+                        if search == "compare":
+                            check_pos, check_score = best_chunk_exhaustive(cue_tokens[i], chunks, confidence_threshold, window)
+                            if check_pos != best_pos:
+                                mismatches += 1
+                                self.log("[WARN] Index/scan mismatch on line {}: {:.2f} vs {:.2f}", i + 1, best_score, check_score)
+                    if best_pos is not None:
+                        widened += attempt > 0
+                        break
+
+                if search == "compare" and picked is not None and picked[i][0] != best_pos:
+                    mismatches += 1
+                    self.log("[WARN] Sparse/scan mismatch on line {}: {:.2f} vs {:.2f}", i + 1, picked[i][1], best_score)
+
+                if best_pos is not None:
+                    timing = (chunk_starts[best_pos], chunk_ends[best_pos])
+
+            if timing:
+                result.starts[i], result.ends[i] = timing
+                result.set_flag(i, MATCHED)
+            # Unmatched cues keep their original timing, to be adjusted
+
+        if widened:
+            self.log("[INFO] {} lines matched only after widening the search window", widened)
+        if search == "compare":
+            self.log("[INFO] Candidate search compare: {} mismatches over {} lines", mismatches, len(original))
+
+        # Cues matched to part of a longer ASR segment: tighten to its words
+        if word_source is not None:
+            needs = segments_needing_words(result, asr)
+            if needs:
+                words = word_source(sorted(needs))
+                moved = sum(refine_cues(result, needs[j], words.get(j)) for j in needs)
+                self.log("[INFO] Word timestamps refined {} lines inside {} ASR segments", moved, len(needs))
+
+        # 🔁 Adjust unmatched blocks based on neighbors
+        self.adjust_unmatched_timing(result)
+
+        self.log("[INFO] Realignment complete: {}/{} lines retimed", count_matched(result), len(original))
+        return result
+
+    def chunk_asr_blocks(self, asr_track, chunk_size=8, step=2):
+        # Sliding word windows over each ASR cue, as a SubtitleTrack of chunks
+        starts, ends, texts = [], [], []
+        for start, end, text in zip(asr_track.starts.tolist(), asr_track.ends.tolist(), asr_track.texts):
+            words = text.split()
+            for i in range(0, len(words) - chunk_size + 1, step):
+                starts.append(start)
+                ends.append(end)
+                texts.append(" ".join(words[i:i + chunk_size]))
+        return SubtitleTrack(starts, ends, texts)
+
+    def adjust_unmatched_timing(self, track):
+        # Retime unmatched cues from their matched neighbours (linear time)
+        return retime_unmatched(track, proportional=self.settings.distribute_unmatched)
+
+
+def count_matched(track):
+    return sum(1 for i in range(len(track)) if track.has_flag(i, MATCHED))
@@ -0,0 +1,127 @@
+# test_job_server.py
+#
+# Offline end-to-end check of the job API: a stub-ASR JobQueue behind a real
+# localhost server, driven over HTTP. No model, ffmpeg or real video needed.
+#
+#   python -m unittest test_job_server
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from job_server import JobQueue, make_server
+from sync_core import read_track
+
+LINES = [
+    "Where were you last night?", "I told you, I was at my brother's place.",
+    "You never go to your brother's place.", "Well, I went this time.",
+    "Your mother called three times.", "What did she want?",
+    "She wants us over for dinner on Sunday.", "Every Sunday is dinner at my mother's.",
+    "That's what I said to her.", "And what did she say to that?",
+    "She said bring the kids and a salad.", "We don't even own a salad bowl.",
+    "Then we'll buy one on the way.", "Fine, but I'm not staying for dessert.",
+    "Nobody leaves before dessert in that house.", "I know. That's the problem.",
+]
+OFFSET_MS = 2500
+
+
+def write_srt(path):
+    with open(path, "w", encoding="utf-8") as f:
+        for n, text in enumerate(LINES):
+            start = 1000 + n * 4000
+            f.write(f"{n + 1}\n00:00:{start // 1000:02},{start % 1000:03} --> "
+                    f"00:00:{(start + 2500) // 1000:02},{(start + 2500) % 1000:03}\n{text}\n\n")
+
+
+class JobServerTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        self.video = os.path.join(self.folder, "episode.mkv")
+        self.subtitle = os.path.join(self.folder, "episode.srt")
+        with open(self.video, "wb") as f:
+            f.write(b"\0" * 1024)
+        write_srt(self.subtitle)
+
+        jobs = JobQueue(stub=True, stub_offset_ms=OFFSET_MS, log=lambda text: None)
+        self.server = make_server(jobs, "127.0.0.1", 0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+
+    def request(self, method, path, body=None, headers=None):
+        data = body if isinstance(body, bytes) or body is None else json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        req = urllib.request.Request(self.base + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                return response.status, response.read().decode("utf-8")
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode("utf-8")
+
+    def test_sync_job_end_to_end(self):
+        output = os.path.join(self.folder, "episode.synced.srt")
+        status, body = self.request("POST", "/jobs", {"video": self.video, "subtitle": self.subtitle, "output": output})
+        self.assertEqual(status, 202, body)
+        job = json.loads(body)
+
+        status, stream = self.request("GET", job["events"])
+        self.assertEqual(status, 200)
+        events = [block.split("\n")[1][len("event: "):] for block in stream.strip().split("\n\n")]
+        self.assertEqual(events[0], "queued")
+        self.assertEqual(events[-1], "done")
+        self.assertEqual(events.count("segment"), len(LINES))
+
+        status, srt = self.request("GET", job["srt"])
+        self.assertEqual(status, 200)
+        synced, original = read_track(output), read_track(self.subtitle)
+        self.assertEqual(srt.replace("\r\n", "\n"), "".join(synced.to_srt_lines()))
+        # The stub "heard" the subtitle OFFSET_MS late, so every matched cue moves by exactly that
+        status, body = self.request("GET", f"/jobs/{job['id']}")
+        matched = json.loads(body)["matched"]
+        self.assertGreater(matched, 0)
+        shifts = [s - o for s, o in zip(synced.starts.tolist(), original.starts.tolist())]
+        self.assertGreaterEqual(shifts.count(OFFSET_MS), matched)
+
+    def test_rejects_non_json_body(self):
+        body = json.dumps({"video": self.video, "subtitle": self.subtitle}).encode("utf-8")
+        status, _ = self.request("POST", "/jobs", body, {"Content-Type": "text/plain"})
+        self.assertEqual(status, 415)
+
+    def test_rejects_foreign_origin_and_host(self):
+        job = {"video": self.video, "subtitle": self.subtitle}
+        status, _ = self.request("POST", "/jobs", job, {"Origin": "https://example.com"})
+        self.assertEqual(status, 403)
+        status, _ = self.request("GET", "/jobs", headers={"Host": "attacker.example:8765"})
+        self.assertEqual(status, 403)
+
+    def test_rejects_output_elsewhere(self):
+        elsewhere = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, elsewhere, ignore_errors=True)
+        for output in (os.path.join(elsewhere, "x.srt"), self.subtitle, os.path.join(self.folder, "notes.txt")):
+            status, _ = self.request("POST", "/jobs", {"video": self.video, "subtitle": self.subtitle, "output": output})
+            self.assertEqual(status, 400, output)
+
+    def test_cancel_before_pipeline_starts(self):
+        # A cancel landing after a worker claims the job but before sync() runs must stick
+        class CancellingQueue(JobQueue):
+            def core_for(self, job, settings):
+                self.cancel(job.id)
+                return super().core_for(job, settings)
+
+        jobs = CancellingQueue(stub=True, stub_offset_ms=OFFSET_MS, log=lambda text: None)
+        job = jobs.submit({"video": self.video, "subtitle": self.subtitle})
+        with job.changed:
+            job.changed.wait_for(lambda: job.finished is not None, timeout=30)
+        self.assertEqual(job.state, "cancelled")
+        self.assertLessEqual(job.segments, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
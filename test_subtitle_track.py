@@ -0,0 +1,53 @@
+# test_subtitle_track.py
+#
+# Retiming of unmatched cues between matched neighbours.
+#
+#   python -m unittest test_subtitle_track
+
+import unittest
+
+from subtitle_track import ADJUSTED, MATCHED, SubtitleTrack, retime_unmatched
+
+
+def track(cues, flags):
+    return SubtitleTrack([c[0] for c in cues], [c[1] for c in cues], [f"line {n}" for n in range(len(cues))], flags)
+
+
+class RetimeUnmatchedTest(unittest.TestCase):
+    def test_centres_cue_in_gap(self):
+        result = retime_unmatched(track([(0, 1000), (5000, 6000), (10000, 11000)], [MATCHED, 0, MATCHED]))
+        self.assertEqual(result[1][:2], (5000, 6000))
+        self.assertTrue(result.has_flag(1, ADJUSTED))
+
+    def test_gap_under_200_ms_keeps_minimum_length(self):
+        # Neighbours 150 ms apart: gap_ms on both sides leaves no room at all
+        for proportional in (False, True):
+            result = retime_unmatched(
+                track([(0, 1000), (3000, 5000), (1150, 2000)], [MATCHED, 0, MATCHED]),
+                proportional=proportional, min_ms=500
+            )
+            start, end = result[1][:2]
+            self.assertEqual(end - start, 500, f"proportional={proportional}")
+
+    def test_short_cue_is_not_lengthened(self):
+        for proportional in (False, True):
+            result = retime_unmatched(
+                track([(0, 1000), (3000, 3200), (1100, 2000)], [MATCHED, 0, MATCHED]),
+                proportional=proportional, min_ms=500
+            )
+            start, end = result[1][:2]
+            self.assertEqual(end - start, 200, f"proportional={proportional}")
+
+    def test_run_keeps_spacing_when_it_fits(self):
+        result = retime_unmatched(
+            track([(0, 1000), (20000, 21000), (22000, 23000), (10000, 11000)], [MATCHED, 0, 0, MATCHED]),
+            proportional=True
+        )
+        (s1, e1), (s2, e2) = result[1][:2], result[2][:2]
+        self.assertEqual((e1 - s1, s2 - s1, e2 - s2), (1000, 2000, 1000))
+        self.assertGreaterEqual(s1, 1100)
+        self.assertLessEqual(e2, 9900)
+
+
+if __name__ == "__main__":
+    unittest.main()
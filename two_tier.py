@@ -0,0 +1,74 @@
+# two_tier.py
+#
+# Two-tier ASR: a small model transcribes the whole track, the merge shows
+# where its transcript is not good enough, and only those regions go through
+# the large model. Most of a typical episode matches fine on the draft; when
+# it doesn't (more than MAX_REDO_COVERAGE of the audio is uncertain), one
+# plain large-model pass is cheaper than draft plus refinement.
+
+from bisect import bisect_right
+
+from asr_windows import cue_windows, is_comment
+from srt_time import seconds_to_ms
+from subtitle_track import ADJUSTED, MATCHED, SubtitleTrack
+
+LOW_LOGPROB = -1.0         # faster-whisper's own log_prob_threshold for a failed decode
+UNCERTAIN_PAD_MS = 1500    # context around each uncertain span
+MAX_REDO_COVERAGE = 0.5    # above this share of the audio, redo everything in one pass
+
+
+def uncertain_windows(result, segments, original=None, pad_ms=UNCERTAIN_PAD_MS, low_logprob=LOW_LOGPROB,
+                      skip_comments=True):
+    """
+    Merged (start_ms, end_ms) spans worth a second pass, each ± pad_ms:
+    every cue of a merged track that found no match, and every draft segment
+    with avg_logprob below low_logprob. Unmatched cues the merge did not
+    place between matched neighbours (ADJUSTED) still have their original,
+    unsynced timing; given the original track they are moved by the shift
+    their nearest matched neighbour received, which puts them in audio time.
+    Windows less than 2 × pad_ms apart are joined.
+    """
+    cue_starts, cue_ends = result.starts.tolist(), result.ends.tolist()
+    shifts = [None] * len(result)
+    if original is not None:
+        orig_starts = original.starts.tolist()
+        matched = [i for i in range(len(result)) if result.has_flag(i, MATCHED)]
+        for i in range(len(result)):
+            j = bisect_right(matched, i)
+            nearest = [matched[k] for k in (j - 1, j) if 0 <= k < len(matched)]
+            if nearest:
+                m = min(nearest, key=lambda k: abs(k - i))
+                shifts[i] = cue_starts[m] - orig_starts[m]
+
+    starts, ends, texts = [], [], []
+    for i, text in enumerate(result.texts):
+        if result.has_flag(i, MATCHED) or (skip_comments and is_comment(text)):
+            continue
+        shift = 0 if result.has_flag(i, ADJUSTED) else shifts[i] or 0
+        starts.append(max(0, cue_starts[i] + shift))
+        ends.append(max(0, cue_ends[i] + shift))
+        texts.append(text)
+    for seg in segments:
+        logprob = getattr(seg, "avg_logprob", None)
+        if logprob is not None and logprob < low_logprob and seg.text.strip():
+            starts.append(seconds_to_ms(seg.start))
+            ends.append(seconds_to_ms(seg.end))
+            texts.append(seg.text.strip())
+
+    joined = []
+    for start, end in cue_windows(SubtitleTrack(starts, ends, texts), pad_ms, skip_comments=False):
+        if joined and start - joined[-1][1] < 2 * pad_ms:
+            joined[-1] = (joined[-1][0], max(joined[-1][1], end))
+        else:
+            joined.append((start, end))
+    return joined
+
+
+def splice_segments(draft, refined, windows):
+    """Draft segments with those centred inside windows replaced by the refined ones."""
+    def inside(seg):
+        mid = seconds_to_ms((seg.start + seg.end) / 2)
+        return any(start <= mid < end for start, end in windows)
+
+    kept = [seg for seg in draft if not inside(seg)]
+    return sorted(kept + list(refined), key=lambda seg: seg.start)
@@ -0,0 +1,134 @@
+# vad_sync.py
+#
+# ASR-free sync: correlate where the audio has speech with where the subtitles
+# have cues. A voice-activity envelope and the rasterized cue on/off times share
+# one time grid, and FFT cross-correlation finds the offset (optionally trying
+# common framerate ratios for the scale) in a couple of seconds on a CPU.
+
+import numpy as np
+
+from audio_stream import SAMPLE_RATE
+
+FRAME_MS = 20
+
+# Framerate conversions that actually occur between releases, plus no change
+COMMON_SCALES = (1.0, 25 / 23.976, 23.976 / 25, 25 / 24, 24 / 25, 24 / 23.976, 23.976 / 24)
+
+
+class VadFit:
+    """
+    offset_ms / scale to apply to the subtitles, plus:
+      correlation — Pearson correlation of envelope and cues at the best lag
+      confidence  — 0…1, how far the best peak stands above the runner-up
+                    (an offset more than a second away); low = ambiguous
+    """
+
+    def __init__(self, offset_ms, scale, correlation, confidence):
+        self.offset_ms = offset_ms
+        self.scale = scale
+        self.correlation = correlation
+        self.confidence = confidence
+
+    def apply(self, track):
+        return track.scaled(self.scale).shifted(int(round(self.offset_ms)))
+
+    def __repr__(self):
+        return (f"VadFit(offset={self.offset_ms:+.0f} ms, scale={self.scale:.5f}, "
+                f"correlation={self.correlation:.3f}, confidence={self.confidence:.2f})")
+
+
+def speech_envelope(samples, frame_ms=FRAME_MS):
+    """
+    Per-frame voice activity in [0, 1] from int16/float PCM: log energy of the
+    speech band (≈300–3400 Hz) relative to the file's own noise floor.
+    """
+    hop = SAMPLE_RATE * frame_ms // 1000
+    n = len(samples) // hop
+    if not n:
+        return np.zeros(0, dtype=np.float32)
+    window = np.hanning(hop).astype(np.float32)
+    freqs = np.fft.rfftfreq(hop, 1 / SAMPLE_RATE)
+    band = (freqs >= 300) & (freqs <= 3400)
+    energy = np.empty(n, dtype=np.float32)
+    step = 20000  # frames per batch keeps the spectra to a few tens of MB
+    for lo in range(0, n, step):
+        hi = min(lo + step, n)
+        frames = np.asarray(samples[lo * hop:hi * hop], dtype=np.float32).reshape(hi - lo, hop)
+        spectrum = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+        energy[lo:hi] = 10 * np.log10(spectrum[:, band].sum(axis=1) + 1e-9)
+
+    floor = np.percentile(energy, 10)
+    loud = np.percentile(energy, 90)
+    envelope = np.clip((energy - floor) / max(loud - floor, 1e-6), 0, 1)
+    # Smooth over ~200 ms so syllable gaps don't read as silence
+    width = max(1, 200 // frame_ms)
+    return np.convolve(envelope, np.ones(width) / width, mode="same").astype(np.float32)
+
+
+def rasterize_cues(track, length, frame_ms=FRAME_MS, scale=1.0, skip_comments=True):
+    """1.0 for frames covered by a cue (times multiplied by scale), 0.0 elsewhere."""
+    raster = np.zeros(length, dtype=np.float32)
+    starts = np.asarray(track.starts, dtype=np.float64) * scale / frame_ms
+    ends = np.asarray(track.ends, dtype=np.float64) * scale / frame_ms
+    keep = np.ones(len(track.texts), dtype=bool)
+    if skip_comments:
+        keep = np.array([not (t.startswith("[") and t.endswith("]")) for t in track.texts], dtype=bool)
+    # Difference array: +1 at each start, -1 at each end, then a running sum
+    delta = np.zeros(length + 1, dtype=np.float32)
+    np.add.at(delta, np.clip(starts[keep].astype(np.int64), 0, length), 1)
+    np.add.at(delta, np.clip(ends[keep].astype(np.int64), 0, length), -1)
+    raster[:] = np.minimum(np.cumsum(delta[:-1]), 1)
+    return raster
+
+
+def _correlate(envelope, raster, max_lag):
+    """Normalised cross-correlation for lags -max_lag…+max_lag (cues moved later = positive)."""
+    a = envelope - envelope.mean()
+    b = raster - raster.mean()
+    size = 1 << int(np.ceil(np.log2(len(a) + len(b))))
+    corr = np.fft.irfft(np.fft.rfft(a, size) * np.conj(np.fft.rfft(b, size)), size)
+    corr = np.concatenate([corr[-max_lag:], corr[:max_lag + 1]]) if max_lag else corr[:1]
+    norm = np.sqrt((a * a).sum() * (b * b).sum()) or 1.0
+    return corr / norm
+
+
+def vad_sync(samples, track, max_offset_ms=120000, scales=(1.0,), frame_ms=FRAME_MS, skip_comments=True):
+    """
+    Best VadFit of track against 16 kHz PCM samples, over offsets within
+    ±max_offset_ms and each candidate scale.
+    """
+    envelope = speech_envelope(samples, frame_ms)
+    length = len(envelope)
+    max_lag = min(max_offset_ms // frame_ms, max(length - 1, 0))
+    guard = max(1, 1000 // frame_ms)  # runner-up peak must be >1 s from the best
+
+    best = None
+    for scale in scales:
+        raster = rasterize_cues(track, length, frame_ms, scale, skip_comments)
+        if not raster.any():
+            continue
+        corr = _correlate(envelope, raster, max_lag)
+        peak = int(np.argmax(corr))
+        value = float(corr[peak])
+
+        # Parabolic interpolation for a sub-frame lag
+        shift = 0.0
+        if 0 < peak < len(corr) - 1:
+            left, right = corr[peak - 1], corr[peak + 1]
+            denom = left - 2 * value + right
+            if denom:
+                shift = 0.5 * (left - right) / denom
+
+        # Runner-up: the best other local maximum, not the main peak's own shoulder
+        is_peak = np.zeros(len(corr), dtype=bool)
+        is_peak[1:-1] = (corr[1:-1] > corr[:-2]) & (corr[1:-1] >= corr[2:])
+        is_peak[max(0, peak - guard):peak + guard + 1] = False
+        baseline = float(np.median(corr))
+        runner_up = float(corr[is_peak].max()) if is_peak.any() else baseline
+        spread = value - baseline
+        confidence = float(np.clip((value - runner_up) / spread, 0, 1)) if spread > 0 else 0.0
+
+        fit = VadFit((peak - max_lag + shift) * frame_ms, scale, value, confidence)
+        if best is None or fit.correlation > best.correlation:
+            best = fit
+    return best or VadFit(0, 1.0, 0.0, 0.0)
@@ -0,0 +1,254 @@
+# watch_folder.py
+#
+# Service mode: watch folders for new video + .srt pairs and sync each pair as
+# soon as both files have finished copying. Changes come from inotify on Linux
+# (through libc, no extra package) or from periodic rescans elsewhere; a file
+# counts as finished once its size and mtime hold still for settle_s seconds.
+# Jobs run with bounded concurrency and the model stays loaded between
+# arrivals, so an episode costs its ASR time and nothing more.
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_sync import VIDEO_EXTENSIONS, pair_episodes
+from model_pool import MODEL_POOL
+from sync_core import output_name
+
+WATCHED_EXTENSIONS = VIDEO_EXTENSIONS + (".srt",)
+
+
+def media_files(folders, recursive=True):
+    """Every video / .srt under folders."""
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            for name in files:
+                if name.lower().endswith(WATCHED_EXTENSIONS):
+                    yield os.path.join(root, name)
+            if not recursive:
+                break
+
+
+# ─── Change sources ─────────────────────────────────────────
+class PollingWatcher:
+    """Rescans the folders every poll_s seconds and reports files whose size or mtime changed."""
+
+    def __init__(self, folders, recursive=True, poll_s=5.0):
+        self.folders = folders
+        self.recursive = recursive
+        self.poll_s = poll_s
+        self._seen = self._scan()
+        self._last = time.time()
+
+    def _scan(self):
+        seen = {}
+        for path in media_files(self.folders, self.recursive):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            seen[path] = (st.st_size, st.st_mtime_ns)
+        return seen
+
+    def changes(self, timeout):
+        wait = self._last + self.poll_s - time.time()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            return set()
+        self._last = time.time()
+        seen = self._scan()
+        changed = {path for path, stat in seen.items() if self._seen.get(path) != stat}
+        self._seen = seen
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify through libc; new subfolders are watched as they appear."""
+
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_ISDIR = 0x40000000
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, folders, recursive=True):
+        self.recursive = recursive
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches = {}
+        for folder in folders:
+            self._watch_tree(folder)
+
+    def _watch_tree(self, folder):
+        for root, dirs, _ in os.walk(folder):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(root), self.MASK)
+            if wd >= 0:
+                self._watches[wd] = root
+            if not self.recursive:
+                break
+
+    def changes(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, _cookie, length = struct.unpack_from("iIII", data, offset)
+            name = os.fsdecode(data[offset + 16:offset + 16 + length].rstrip(b"\0"))
+            offset += 16 + length
+            folder = self._watches.get(wd)
+            if folder is None or not name:
+                continue
+            path = os.path.join(folder, name)
+            if mask & self.IN_ISDIR:
+                if self.recursive and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    # A folder moved or copied in: watch it, and pick up what is already inside
+                    self._watch_tree(path)
+                    changed.update(media_files([path]))
+            elif name.lower().endswith(WATCHED_EXTENSIONS):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def make_watcher(folders, recursive=True, poll_s=5.0, log=None):
+    """InotifyWatcher where the OS has it, else PollingWatcher."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folders, recursive)
+        except (OSError, AttributeError) as e:
+            if log:
+                log(f"[WARN] inotify unavailable ({e}); polling every {poll_s:.0f} s")
+    return PollingWatcher(folders, recursive, poll_s)
+
+
+# ─── Daemon ─────────────────────────────────────────────────
+class WatchDaemon:
+    """
+    core_factory() returns a fresh SyncCore per job (each with its own stop
+    flag); all of them share the process-wide MODEL_POOL. Pairs whose output
+    already exists are skipped, so a restart doesn't redo finished episodes.
+    """
+
+    def __init__(self, core_factory, folders, settle_s=10.0, concurrency=1, recursive=True, poll_s=5.0,
+                 skip_existing=False, log=None):
+        self.core_factory = core_factory
+        self.folders = [os.path.abspath(f) for f in folders]
+        self.settle_s = settle_s
+        self.concurrency = max(1, concurrency)
+        self.recursive = recursive
+        self.poll_s = poll_s
+        self.skip_existing = skip_existing
+        self.log = log or (lambda text: print(text, flush=True))
+        self.settings = core_factory().settings
+        self._settling = {}   # path -> ((size, mtime_ns), unchanged since)
+        self._active = {}     # video -> (future, core)
+        self._finished = {}   # video -> (size, mtime_ns) it was synced (or failed) at
+        self._lock = threading.Lock()
+
+    def output_for(self, video, subtitle):
+        return output_name(video, subtitle, self.settings.beam_size, self.settings.word_level_asr)
+
+    def run(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        first = self.core_factory()
+        MODEL_POOL.idle_timeout = 0  # warm for the whole session, however long between arrivals
+        if first.model_path:
+            MODEL_POOL.prewarm(first.model_path, **first.runtime)
+
+        watcher = make_watcher(self.folders, self.recursive, self.poll_s, self.log)
+        self.log(f"[INFO] Watching {', '.join(self.folders)} with {type(watcher).__name__} "
+                 f"(settle {self.settle_s:.0f} s, {self.concurrency} at a time)")
+        for path in media_files(self.folders, self.recursive):
+            if self.skip_existing:
+                self._finished[path] = self._stat(path)
+            else:
+                self._touch(path)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="watch-sync") as pool:
+            try:
+                while not stop_event.is_set():
+                    for path in watcher.changes(timeout=1.0):
+                        self._touch(path)
+                    for folder in self._settled_folders():
+                        self._dispatch(folder, pool)
+            finally:
+                watcher.close()
+                pool.shutdown(wait=False, cancel_futures=True)  # queued jobs never start
+                with self._lock:
+                    for _, core in self._active.values():
+                        core.stop_flag.set()
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _touch(self, path):
+        stat = self._stat(path)
+        if stat is not None and self._finished.get(path) != stat:
+            self._settling[path] = (stat, time.time())
+
+    def _settled_folders(self):
+        """Folders in which some file just finished copying."""
+        now = time.time()
+        folders = set()
+        for path, (stat, since) in list(self._settling.items()):
+            current = self._stat(path)
+            if current is None:
+                del self._settling[path]  # deleted or moved away again
+            elif current != stat:
+                self._settling[path] = (current, now)  # still being written
+            elif now - since >= self.settle_s:
+                del self._settling[path]
+                folders.add(os.path.dirname(path))
+        return folders
+
+    def _dispatch(self, folder, pool):
+        for video, subtitle in pair_episodes(folder):
+            if video in self._settling or subtitle in self._settling:
+                continue  # the other half is still copying
+            output = self.output_for(video, subtitle)
+            with self._lock:
+                if video in self._active or os.path.exists(output):
+                    continue
+                if self._finished.get(video) == self._stat(video):
+                    continue  # already tried this exact file
+                core = self.core_factory()
+                self._active[video] = (pool.submit(self._job, core, video, subtitle, output), core)
+            self.log(f"[INFO] Queued {os.path.basename(video)}")
+
+    def _job(self, core, video, subtitle, output):
+        started = time.time()
+        try:
+            result = core.sync(video, subtitle, output)
+            matched = f"{result.matched}/{len(result.track)} lines retimed" if result.matched is not None else result.method
+            self.log(f"[INFO] Synced {os.path.basename(video)} in {time.time() - started:.0f} s ({matched}) → {os.path.basename(output)}")
+        except Exception as e:
+            self.log(f"[ERROR] {os.path.basename(video)} failed after {time.time() - started:.0f} s: {type(e).__name__}: {e}")
+        finally:
+            with self._lock:
+                self._finished[video] = self._stat(video)
+                self._active.pop(video, None)
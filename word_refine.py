@@ -0,0 +1,83 @@
+# word_refine.py
+#
+# Word-level refinement of matched cues. A cue matched to part of a longer ASR
+# segment gets the segment's timing (greedy) or an evenly interpolated guess
+# (DP); with the segment's word timestamps its boundaries can be set exactly.
+# Only segments that span several cues need word timestamps at all.
+
+from bisect import bisect_right
+
+from matching import clean_token, token_set
+from srt_time import seconds_to_ms
+from subtitle_track import MATCHED
+
+
+def segments_needing_words(track, asr_track, ratio=2):
+    """
+    {asr position: [cue positions]} for ASR segments that span several cues:
+    the start of more than one MATCHED cue falls inside the segment, or a
+    matched cue holds fewer than 1/ratio of the segment's words. Those cues
+    share (or sit inside) the segment's timing and only its word timestamps
+    can separate them. A cue that is most of its segment already fits it.
+    """
+    asr_starts = asr_track.starts.tolist()
+    asr_ends = asr_track.ends.tolist()
+    inside = {}
+    for i, start in enumerate(track.starts.tolist()):
+        if not track.has_flag(i, MATCHED):
+            continue
+        j = bisect_right(asr_starts, start) - 1
+        if j >= 0 and start < asr_ends[j]:
+            inside.setdefault(j, []).append(i)
+    return {
+        j: cues for j, cues in inside.items()
+        if len(cues) > 1 or len(asr_track.texts[j].split()) > ratio * len(track.texts[cues[0]].split())
+    }
+
+
+def segment_words(segment):
+    """(token, start_ms, end_ms) for each word of a faster-whisper segment with words."""
+    return [
+        (clean_token(w.word), seconds_to_ms(w.start), seconds_to_ms(w.end))
+        for w in segment.words or ()
+        if w.word.strip()
+    ]
+
+
+def words_in_spans(segments, spans_ms, pad_ms=500):
+    """Split the words of re-transcribed segments back over spans_ms by time."""
+    words = sorted((w for seg in segments for w in segment_words(seg)), key=lambda w: w[1])
+    return [[w for w in words if start - pad_ms <= w[1] < end + pad_ms] for start, end in spans_ms]
+
+
+def refine_cues(track, cue_positions, words, min_score=0.5):
+    """
+    Retime each cue to the run of `words` that best covers its tokens.
+    Returns how many cues moved.
+    """
+    if not words:
+        return 0
+    tokens = [w[0] for w in words]
+    moved = 0
+    for i in cue_positions:
+        wanted = token_set(track.texts[i])
+        if not wanted:
+            continue
+        span = len(track.texts[i].split())
+        best, best_k, best_last = 0.0, None, None
+        for k in range(len(tokens)):
+            if tokens[k] not in wanted:
+                continue
+            seen = set()
+            last = k
+            for j in range(k, min(k + span + 1, len(tokens))):
+                if tokens[j] in wanted:
+                    seen.add(tokens[j])
+                    last = j
+            score = len(seen) / len(wanted)
+            if score > best:
+                best, best_k, best_last = score, k, last
+        if best_k is not None and best >= min_score:
+            track.starts[i], track.ends[i] = words[best_k][1], words[best_last][2]
+            moved += 1
+    return moved